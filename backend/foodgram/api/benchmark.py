@@ -0,0 +1,289 @@
+import base64
+import io
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.image_uploads import process_pending_image
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+    return ordered[index]
+
+
+def summary(values, digits=3):
+    return {
+        'p50': round(percentile(values, 50), digits),
+        'p90': round(percentile(values, 90), digits),
+        'p99': round(percentile(values, 99), digits),
+        'mean': round(statistics.mean(values), digits),
+        'max': round(max(values), digits),
+    }
+
+
+def png_data_uri():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+class BenchmarkData:
+    """Параметры запросов, выбранные из текущих данных.
+
+    Пользователем становится тот, у кого больше всего подписок,
+    рецептов в избранном и корзине: его запросы самые тяжёлые. Если
+    в базе есть пользователи seed_benchmark с префиксом prefix, он
+    выбирается только среди них.
+    """
+
+    def __init__(self, rnd, prefix='bench'):
+        self.random = rnd
+        users = User.objects.filter(username__startswith=f'{prefix}_')
+        self.seeded = users.exists()
+        if not self.seeded:
+            users = User.objects.all()
+        self.user = users.annotate(
+            relations=Count('follower', distinct=True)
+            + Count('starred', distinct=True)
+            + Count('cart', distinct=True)
+        ).order_by('-relations', 'pk').first()
+        self.recipe_ids = list(
+            Recipe.objects.order_by('pk').values_list('pk', flat=True))
+        self.tag_slugs = list(
+            Tag.objects.order_by('pk').values_list('slug', flat=True))
+        self.tag_ids = list(
+            Tag.objects.order_by('pk').values_list('pk', flat=True))
+        self.ingredient_names = list(
+            Ingredient.objects.order_by('pk').values_list('name', flat=True))
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by('pk').values_list('pk', flat=True))
+        self.author_ids = list(Recipe.objects.order_by().values_list(
+            'author_id', flat=True).distinct()[:100])
+
+    def counts(self):
+        return {
+            'seeded': self.seeded,
+            'users': User.objects.count(),
+            'recipes': len(self.recipe_ids),
+            'tags': len(self.tag_slugs),
+            'ingredients': len(self.ingredient_names),
+        }
+
+    def tags(self):
+        return ','.join(self.random.sample(
+            self.tag_slugs, min(len(self.tag_slugs), 2)))
+
+    def ingredient_query(self):
+        name = self.random.choice(self.ingredient_names)
+        return name[:self.random.randint(1, min(len(name), 5))]
+
+    def recipe_payload(self, image):
+        return {
+            'name': 'Рецепт для замера',
+            'text': 'Описание',
+            'cooking_time': self.random.randint(1, 120),
+            'tags': self.random.sample(
+                self.tag_ids, min(len(self.tag_ids), 2)),
+            'ingredients': [
+                {'id': pk, 'amount': self.random.randint(1, 500)}
+                for pk in self.random.sample(
+                    self.ingredient_ids, min(len(self.ingredient_ids), 8))
+            ],
+            'image': image,
+        }
+
+
+def scenarios(data):
+    """Сценарии: имя, признак авторизации и функция, которая по данным
+    строит (метод, путь, параметры, ожидаемый статус)"""
+    image = png_data_uri()
+    return [
+        ('recipe_feed', False, lambda: (
+            'get', '/api/recipes/',
+            {'page': data.random.randint(1, 5)}, 200)),
+        ('recipe_feed_filtered', True, lambda: (
+            'get', '/api/recipes/',
+            {'tags': data.tags(), 'is_favorited': data.random.choice(
+                ('0', '1'))}, 200)),
+        ('recipe_feed_author', False, lambda: (
+            'get', '/api/recipes/',
+            {'author': data.random.choice(data.author_ids)}, 200)),
+        ('recipe_detail', True, lambda: (
+            'get', f'/api/recipes/{data.random.choice(data.recipe_ids)}/',
+            None, 200)),
+        ('subscriptions', True, lambda: (
+            'get', '/api/users/subscriptions/', {'recipes_limit': 3}, 200)),
+        ('ingredient_search', False, lambda: (
+            'get', '/api/ingredients/',
+            {'name': data.ingredient_query()}, 200)),
+        ('shopping_list_download', True, lambda: (
+            'get', '/api/recipes/download_shopping_cart/',
+            {'format': 'txt'}, 200)),
+        ('recipe_create', True, lambda: (
+            'post', '/api/recipes/', data.recipe_payload(image), 201)),
+    ]
+
+
+class BenchmarkRunner:
+    """Выполняет сценарии через тестовый клиент Django.
+
+    Для каждого запроса записываются время и число SQL-запросов;
+    выделения памяти замеряются отдельным проходом под tracemalloc,
+    чтобы трассировка не искажала время.
+
+    Сценарии создают рецепты от имени выбранного пользователя, поэтому
+    без данных seed_benchmark замеры запускаются только с allow_writes.
+    Кэш ответов для анонимных запросов на время замеров отключается,
+    иначе повторные запросы ленты измеряют чтение из кэша. С
+    response_cache он остаётся включённым, а время попаданий и
+    промахов выводится отдельно.
+    """
+
+    def __init__(self, iterations=50, memory_iterations=10, seed=0,
+                 prefix='bench', allow_writes=False, response_cache=False):
+        self.iterations = iterations
+        self.memory_iterations = memory_iterations
+        self.random = random.Random(seed)
+        self.data = BenchmarkData(self.random, prefix)
+        self.prefix = prefix
+        self.allow_writes = allow_writes
+        self.response_cache = response_cache
+        self.created = []
+
+    def client(self, authenticated):
+        client = APIClient()
+        if authenticated:
+            client.force_authenticate(self.data.user)
+        return client
+
+    def request(self, client, build):
+        method, path, params, expected = build()
+        if method == 'get':
+            response = client.get(path, params)
+        else:
+            response = client.post(path, params, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code != expected:
+            raise AssertionError(
+                f'{method.upper()} {path}: {response.status_code}')
+        if method == 'post':
+            self.created.append(response.data['id'])
+        return response
+
+    def measure(self, client, build):
+        timings, queries = [], []
+        by_cache = {}
+        for _ in range(self.iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = self.request(client, build)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured.captured_queries))
+            if response.has_header('X-Cache'):
+                by_cache.setdefault(
+                    response['X-Cache'].lower(), []).append(timings[-1])
+        peaks, retained = [], []
+        for _ in range(self.memory_iterations):
+            tracemalloc.start()
+            try:
+                self.request(client, build)
+                current, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            peaks.append(peak / 1024)
+            retained.append(current / 1024)
+        result = {
+            'requests': len(timings),
+            'latency_ms': summary(timings),
+            'queries': {
+                'min': min(queries),
+                'max': max(queries),
+                'mean': round(statistics.mean(queries), 2),
+            },
+        }
+        if by_cache:
+            result['latency_ms_by_cache'] = {
+                state: dict(summary(values), requests=len(values))
+                for state, values in by_cache.items()
+            }
+        if peaks:
+            result['memory_kb'] = {
+                'peak': summary(peaks, 1),
+                'retained_mean': round(statistics.mean(retained), 1),
+            }
+        return result
+
+    def cleanup(self):
+        """Удаляет созданные рецепты, дождавшись обработки изображений"""
+        for recipe_id in self.created:
+            process_pending_image(recipe_id)
+        Recipe.objects.filter(pk__in=self.created).delete()
+        self.created = []
+
+    def run(self, only=None):
+        if self.data.user is None or not self.data.recipe_ids:
+            raise ValueError('Нет данных для замеров, '
+                             'запустите seed_benchmark')
+        if not self.data.seeded and not self.allow_writes:
+            raise ValueError(
+                f'Нет пользователей seed_benchmark с префиксом '
+                f'{self.prefix}_. Замеры создают рецепты, для запуска на '
+                f'этих данных передайте --allow-writes')
+        results = {}
+        timeout = (settings.RECIPES_RESPONSE_CACHE_TIMEOUT
+                   if self.response_cache else 0)
+        try:
+            with override_settings(RECIPES_RESPONSE_CACHE_TIMEOUT=timeout):
+                for name, authenticated, build in scenarios(self.data):
+                    if only and name not in only:
+                        continue
+                    client = self.client(authenticated)
+                    self.request(client, build)
+                    results[name] = self.measure(client, build)
+        finally:
+            self.cleanup()
+        return results
+
+    def report(self, results):
+        return {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'database': connection.vendor,
+            'iterations': self.iterations,
+            'memory_iterations': self.memory_iterations,
+            'response_cache': self.response_cache,
+            'data': self.data.counts(),
+            'scenarios': results,
+        }
+
+
+def compare(report, baseline):
+    """Строки сравнения p50 и числа запросов с прошлым отчётом"""
+    lines = []
+    for name, result in report['scenarios'].items():
+        latency = result['latency_ms']['p50']
+        queries = result['queries']['max']
+        line = f'{name:>24}: p50 {latency:9.3f} ms, запросов {queries:3}'
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous:
+            before = previous['latency_ms']['p50']
+            change = (latency - before) / max(before, 1e-9) * 100
+            added = queries - previous['queries']['max']
+            line += f' ({change:+.1f}% p50, {added:+d} запросов)'
+        lines.append(line)
+    return lines
@@ -1,4 +1,6 @@
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
 from django_filters.rest_framework import BaseInFilter, CharFilter, FilterSet
+from rest_framework.filters import OrderingFilter
 
 from recipes.models import Ingredient, Recipe
 
@@ -8,13 +10,10 @@ class CharFilterInFilter(BaseInFilter, CharFilter):
 
 
 class RecipeFilter(FilterSet):
-    tags = CharFilterInFilter(
-        field_name='tags__slug',
-        lookup_expr='in'
-    )
+    tags = CharFilterInFilter(method='filter_tags')
     name = CharFilter(
         field_name='name',
-        lookup_expr='contains'
+        lookup_expr='icontains'
     )
     author = CharFilterInFilter(
         field_name='author__pk',
@@ -25,13 +24,54 @@ class RecipeFilter(FilterSet):
         model = Recipe
         fields = ('tags', 'name')
 
+    def filter_tags(self, queryset, name, value):
+        """Фильтр по тегам через EXISTS: рецепты не дублируются
+        при совпадении нескольких тегов и DISTINCT не нужен.
+
+        Теги можно передать повторяющимся параметром или через запятую.
+        """
+        slugs = {
+            slug
+            for item in self.data.getlist(name)
+            for slug in item.split(',') if slug
+        }
+        return queryset.annotate(
+            has_tags=Exists(Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'), tag__slug__in=slugs))
+        ).filter(has_tags=True)
+
 
 class IngredientFilter(FilterSet):
-    name = CharFilter(
-        field_name='name',
-        lookup_expr='contains'
-    )
+    name = CharFilter(method='filter_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
+
+    def filter_name(self, queryset, name, value):
+        """Совпадения с начала названия выводятся раньше остальных"""
+        return queryset.filter(
+            name__icontains=value
+        ).annotate(
+            search_rank=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('search_rank', 'name')
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Дополняет порядок из параметра ordering полем -id.
+
+    У большинства рецептов счётчики избранного и корзин равны нулю, и
+    без однозначного порядка страницы пересекаются или теряют рецепты.
+    С -id сортировку по счётчику обслуживает индекс (-счётчик, -id).
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and not any(
+                field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering = [*ordering, '-id']
+        return ordering
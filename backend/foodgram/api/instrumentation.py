@@ -0,0 +1,132 @@
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+_local = threading.local()
+
+
+class RequestMetrics:
+    """Замеры одного запроса.
+
+    Запросы к базе группируются по тексту SQL: параметры в нём заменены
+    плейсхолдерами, поэтому повторы одного текста в пределах запроса —
+    признак N+1.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.view = None
+        self.queries = {}
+        self.query_count = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.db_time += duration
+            self.query_count += 1
+            count, total = self.queries.get(sql, (0, 0.0))
+            self.queries[sql] = (count + 1, total + duration)
+
+    @property
+    def duplicates(self):
+        return self.query_count - len(self.queries)
+
+    @property
+    def total_time(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def as_dict(self):
+        return {
+            'view': self.view,
+            'total_ms': round(self.total_time * 1000, 2),
+            'db_ms': round(self.db_time * 1000, 2),
+            'queries': self.query_count,
+            'duplicates': self.duplicates,
+            'serializer_ms': round(self.serializer_time * 1000, 2),
+        }
+
+    def server_timing(self):
+        return ', '.join((
+            f'total;dur={self.total_time * 1000:.2f}',
+            f'db;dur={self.db_time * 1000:.2f};'
+            f'desc="{self.query_count} queries '
+            f'{self.duplicates} duplicates"',
+            f'serializer;dur={self.serializer_time * 1000:.2f}',
+        ))
+
+    def top_queries(self, limit):
+        """Самые долгие по суммарному времени тексты SQL"""
+        ordered = sorted(self.queries.items(),
+                         key=lambda item: item[1][1], reverse=True)
+        return [
+            {'sql': sql, 'count': count, 'ms': round(total * 1000, 2)}
+            for sql, (count, total) in ordered[:limit]
+        ]
+
+
+def current_metrics():
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def collect_metrics():
+    """Собирает замеры запросов ко всем базам в текущем потоке.
+
+    Вложенный вызов возвращает уже собираемые замеры, поэтому несколько
+    middleware могут пользоваться одними и теми же данными.
+    """
+    metrics = current_metrics()
+    if metrics is not None:
+        yield metrics
+        return
+    metrics = RequestMetrics()
+    _local.metrics = metrics
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            yield metrics
+    finally:
+        metrics.finish()
+        _local.metrics = None
+
+
+def view_name(view_func, method):
+    """Имя вьюсета и действия, например RecipeViewSet.list"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return f'{view_func.__module__}.{view_func.__name__}'
+    action = (getattr(view_func, 'actions', None) or {}).get(method.lower())
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+class TimedSerializerMixin:
+    """Учитывает время to_representation в замерах запроса.
+
+    Вложенные сериализаторы не считаются повторно. В время входят и
+    запросы к базе, которые выполняются при сериализации.
+    """
+
+    def to_representation(self, instance):
+        metrics = current_metrics()
+        if metrics is None or metrics.serializer_depth:
+            return super().to_representation(instance)
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            metrics.serializer_time += time.perf_counter() - started
+            metrics.serializer_depth -= 1
@@ -0,0 +1,52 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from api.benchmark import percentile
+from api.views import IngredientsViewSet
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = ('Compare ingredient search latency: in-memory catalog '
+            'against IngredientFilter')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def measure(self, view, queries, catalog_enabled):
+        factory = APIRequestFactory()
+        timings = []
+        with override_settings(INGREDIENTS_CATALOG_ENABLED=catalog_enabled):
+            view(factory.get('/api/ingredients/', {'name': queries[0]}))
+            for query in queries:
+                request = factory.get('/api/ingredients/', {'name': query})
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            self.stderr.write('Справочник ингредиентов пуст')
+            return
+        rnd = random.Random(options['seed'])
+        queries = []
+        for _ in range(options['requests']):
+            name = rnd.choice(names)
+            queries.append(name[:rnd.randint(1, min(len(name), 5))])
+        view = IngredientsViewSet.as_view({'get': 'list'})
+        for title, catalog_enabled in (('IngredientFilter', False),
+                                       ('catalog', True)):
+            timings = self.measure(view, queries, catalog_enabled)
+            self.stdout.write(
+                f'{title:>16}: p50 {percentile(timings, 50):.3f} ms, '
+                f'p99 {percentile(timings, 99):.3f} ms '
+                f'({len(timings)} requests)'
+            )
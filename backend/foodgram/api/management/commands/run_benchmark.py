@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import BenchmarkRunner, compare
+
+
+class Command(BaseCommand):
+    help = ('Drive the main API endpoints through the test client and '
+            'write query counts, latency percentiles and allocations '
+            'to a JSON report')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument(
+            '--memory-iterations', type=int, default=10,
+            help='Requests per scenario traced with tracemalloc')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios',
+            help='Run only the given scenario, can be repeated')
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Path of the JSON report')
+        parser.add_argument(
+            '--baseline', help='Previous report to compare with')
+        parser.add_argument(
+            '--prefix', default='bench',
+            help='Prefix of users generated by seed_benchmark')
+        parser.add_argument(
+            '--allow-writes', action='store_true',
+            help='Run on data without seed_benchmark users; scenarios '
+                 'create and delete recipes')
+        parser.add_argument(
+            '--response-cache', action='store_true',
+            help='Keep the anonymous response cache on and report hits '
+                 'and misses separately')
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        runner = BenchmarkRunner(
+            options['iterations'], options['memory_iterations'],
+            options['seed'], prefix=options['prefix'],
+            allow_writes=options['allow_writes'],
+            response_cache=options['response_cache'])
+        try:
+            results = runner.run(options['scenarios'])
+        except (ValueError, AssertionError) as error:
+            raise CommandError(error)
+        report = runner.report(results)
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2,
+                      sort_keys=True)
+        for line in compare(report, baseline):
+            self.stdout.write(line)
+        self.stdout.write(f'Отчёт сохранён в {options["output"]}')
@@ -0,0 +1,69 @@
+import os
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+REQUEST_LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса по вьюсетам',
+    ['view', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Counter(
+    'foodgram_db_queries_total',
+    'Запросы к базе данных по вьюсетам',
+    ['view'],
+)
+DB_DUPLICATE_QUERIES = Counter(
+    'foodgram_db_duplicate_queries_total',
+    'Повторы одного текста SQL в пределах запроса',
+    ['view'],
+)
+DB_TIME = Counter(
+    'foodgram_db_query_seconds_total',
+    'Время выполнения запросов к базе данных',
+    ['view'],
+)
+SHOPPING_LIST_DURATION = Histogram(
+    'foodgram_shopping_list_generation_seconds',
+    'Время формирования файла со списком покупок',
+    ['format'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+
+def observe_request(metrics, method, status):
+    view = metrics.view or 'unresolved'
+    REQUEST_LATENCY.labels(view, method, status).observe(metrics.total_time)
+    DB_QUERIES.labels(view).inc(metrics.query_count)
+    DB_DUPLICATE_QUERIES.labels(view).inc(metrics.duplicates)
+    DB_TIME.labels(view).inc(metrics.db_time)
+
+
+def timed_stream(histogram, chunks):
+    """Отдаёт части потокового ответа и замеряет время до последней.
+
+    Для потоковых ответов запрос к базе и формирование файла
+    выполняются уже после выхода из вьюсета.
+    """
+    started = time.perf_counter()
+    try:
+        yield from chunks
+    finally:
+        histogram.observe(time.perf_counter() - started)
+
+
+def get_registry():
+    """При запуске под gunicorn каждый процесс пишет метрики в файлы
+    каталога PROMETHEUS_MULTIPROC_DIR, при выборке они суммируются"""
+    if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def exposition():
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
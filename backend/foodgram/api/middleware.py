@@ -0,0 +1,81 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .instrumentation import collect_metrics, current_metrics, view_name
+from .metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+
+class RequestInstrumentationMiddleware:
+    """Время запроса, время в базе, число и повторы SQL-запросов и время
+    сериализации.
+
+    Включается настройкой REQUEST_INSTRUMENTATION_ENABLED. Замеры
+    отдаются заголовком Server-Timing и строкой журнала в JSON. Для
+    медленных запросов и запросов с большим числом повторов в журнал
+    попадают тексты самых долгих SQL-запросов, без параметров.
+    Потоковые ответы замеряются до начала отправки тела.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_metrics() as metrics:
+            response = self.get_response(request)
+        self.report(request, response, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.view = view_name(view_func, request.method)
+
+    def report(self, request, response, metrics):
+        server_timing = metrics.server_timing()
+        if response.has_header('Server-Timing'):
+            server_timing = f'{response["Server-Timing"]}, {server_timing}'
+        response['Server-Timing'] = server_timing
+
+        data = metrics.as_dict()
+        slow = (data['total_ms'] >= settings.REQUEST_INSTRUMENTATION_SLOW_MS
+                or data['duplicates']
+                >= settings.REQUEST_INSTRUMENTATION_DUPLICATES)
+        level = logging.WARNING if slow else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+        data.update(method=request.method, path=request.path,
+                    status=response.status_code)
+        if slow:
+            data['sql'] = metrics.top_queries(
+                settings.REQUEST_INSTRUMENTATION_SQL_LIMIT)
+        logger.log(level, json.dumps(data, ensure_ascii=False),
+                   extra={'request_metrics': data})
+
+
+class MetricsMiddleware:
+    """Гистограммы времени запросов и счётчики SQL-запросов по вьюсетам
+    для выборки через /metrics. Отключается настройкой METRICS_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect_metrics() as metrics:
+            response = self.get_response(request)
+        observe_request(metrics, request.method, response.status_code)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.view = view_name(view_func, request.method)
@@ -1,4 +1,9 @@
-from rest_framework import mixins, viewsets
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import mixins, status, viewsets
+from rest_framework.response import Response
 
 
 class AllMethodsMixin(
@@ -36,3 +41,96 @@ class ListRetreiveMixin(
     viewsets.GenericViewSet,
 ):
     pass
+
+
+class ConditionalResponseError(Exception):
+    """Готовый ответ 304 или 412, прерывающий обработку запроса"""
+
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """ETag и Last-Modified для list и retrieve.
+
+    get_conditional_validators() возвращает (ключ, время изменения в
+    секундах) без сериализации ответа. Если клиент прислал совпадающие
+    If-None-Match или If-Modified-Since, обработчик не вызывается
+    и отдаётся 304.
+    """
+    conditional_actions = ('list', 'retrieve')
+
+    def get_conditional_validators(self):
+        return None, None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.conditional_validators = None, None
+        if (request.method not in ('GET', 'HEAD')
+                or self.action not in self.conditional_actions):
+            return
+        key, last_modified = self.get_conditional_validators()
+        if key is None:
+            return
+        etag = quote_etag(hashlib.md5(str(key).encode()).hexdigest())
+        last_modified = int(last_modified)
+        self.conditional_validators = etag, last_modified
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            raise ConditionalResponseError(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ConditionalResponseError):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        etag, last_modified = getattr(
+            self, 'conditional_validators', (None, None))
+        if etag and response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class AnonymousResponseCacheMixin:
+    """Кэширует данные ответов list и retrieve для анонимных запросов.
+
+    Для анонимного пользователя ответ не зависит от избранного, корзины
+    и подписок, поэтому один ответ подходит всем. Заголовок X-Cache
+    показывает, был ли ответ взят из кэша.
+    """
+    response_cache = None
+    response_cache_actions = ('list', 'retrieve')
+
+    def is_response_cacheable(self):
+        return True
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if (self.response_cache is None
+                or not self.response_cache.timeout
+                or not request.user.is_anonymous
+                or self.action not in self.response_cache_actions
+                or not self.is_response_cacheable()):
+            return handler(request, *args, **kwargs)
+        key = self.response_cache.make_key(request, self.action)
+        data = self.response_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            self.response_cache.set(key, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,14 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Пагинация ленты рецептов по курсору (pub_date, id).
+
+    Не выполняет COUNT(*) и не использует OFFSET, поэтому время ответа
+    не зависит от номера страницы и размера каталога.
+    """
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = ('-pub_date', '-id')
@@ -0,0 +1,133 @@
+import csv
+import io
+
+from django.conf import settings
+from django.http import Http404
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+SHOPPING_LIST_TITLE = 'Ваш список покупок:'
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Базовый рендерер списка покупок.
+
+    stream() принимает итерируемый набор ингредиентов и отдаёт
+    документ по частям, чтобы ответ можно было отправлять потоком.
+    """
+    charset = 'utf-8'
+
+    def stream(self, ingredients):
+        raise NotImplementedError(
+            'Рендерер должен реализовать метод stream()')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(self.stream(data))
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        yield f'{SHOPPING_LIST_TITLE} \n\n'.encode(self.charset)
+        for ingredient in ingredients:
+            yield (
+                f'{ingredient["name"]} '
+                f'{ingredient["total_amount"]} '
+                f'{ingredient["measurement_unit"]}\n'
+            ).encode(self.charset)
+
+
+class Echo:
+    """Псевдобуфер: csv.writer пишет строку и сразу получает её назад"""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Количество', 'Единицы')).encode(self.charset)
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['name'],
+                ingredient['total_amount'],
+                ingredient['measurement_unit'],
+            )).encode(self.charset)
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+    chunk_size = 64 * 1024
+
+    def register_font(self):
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(
+                TTFont(self.font_name, settings.SHOPPING_LIST_PDF_FONT))
+
+    def stream(self, ingredients):
+        self.register_font()
+        buffer = io.BytesIO()
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        line_height = self.font_size * 1.5
+        pdf.setFont(self.font_name, self.font_size + 4)
+        pdf.drawString(self.margin, height - self.margin,
+                       SHOPPING_LIST_TITLE)
+        y = height - self.margin - line_height * 2
+        pdf.setFont(self.font_name, self.font_size)
+        for ingredient in ingredients:
+            if y < self.margin:
+                pdf.showPage()
+                pdf.setFont(self.font_name, self.font_size)
+                y = height - self.margin
+            pdf.drawString(
+                self.margin, y,
+                f'• {ingredient["name"]} '
+                f'({ingredient["measurement_unit"]}) — '
+                f'{ingredient["total_amount"]}'
+            )
+            y -= line_height
+        pdf.save()
+        buffer.seek(0)
+        yield from iter(lambda: buffer.read(self.chunk_size), b'')
+
+
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListPDFRenderer,
+)
+
+
+class ShoppingListContentNegotiation(DefaultContentNegotiation):
+    """Формат списка покупок выбирается только параметром ?format=.
+
+    Заголовок Accept не учитывается, по умолчанию отдаётся текст.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        format_query_param = self.settings.URL_FORMAT_OVERRIDE
+        requested_format = format_suffix or request.query_params.get(
+            format_query_param)
+        if not requested_format:
+            return renderers[0], renderers[0].media_type
+        for renderer in renderers:
+            if renderer.format == requested_format:
+                return renderer, renderer.media_type
+        raise Http404
@@ -0,0 +1,59 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import urlencode
+
+from recipes.metrics import record_cache_access
+from recipes.versions import RECIPE_FEED_GENERATION_KEY, get_version
+
+
+def normalize_query(query_params):
+    """Параметры запроса в каноническом виде: порядок параметров
+    и повторяющихся значений не влияет на ключ"""
+    return urlencode(sorted(
+        (key, value)
+        for key in query_params
+        for value in query_params.getlist(key)
+    ))
+
+
+class RecipeResponseCache:
+    """Кэш данных ответа для анонимных запросов к рецептам.
+
+    В ключ входит поколение ленты, которое меняется при любой записи
+    рецептов, тегов и ингредиентов, поэтому старые записи просто
+    перестают читаться и истекают по таймауту.
+    """
+    prefix = 'recipes_response'
+
+    @property
+    def cache(self):
+        return caches[settings.RECIPES_RESPONSE_CACHE_ALIAS]
+
+    @property
+    def timeout(self):
+        return settings.RECIPES_RESPONSE_CACHE_TIMEOUT
+
+    def make_key(self, request, action):
+        location = '?'.join((
+            request.get_host() + request.path,
+            normalize_query(request.query_params),
+        ))
+        return ':'.join((
+            self.prefix,
+            str(get_version(RECIPE_FEED_GENERATION_KEY)),
+            action,
+            hashlib.md5(location.encode()).hexdigest(),
+        ))
+
+    def get(self, key):
+        data = self.cache.get(key)
+        record_cache_access('recipe_response', data is not None)
+        return data
+
+    def set(self, key, data):
+        self.cache.set(key, data, self.timeout)
+
+
+recipe_response_cache = RecipeResponseCache()
@@ -1,16 +1,27 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from recipes.models import (Favorite, Ingredient, IngredientRecipeAmount,
-                            Recipe, ShoppingCart, Tag)
+from recipes.image_uploads import (find_upload, save_base64_upload,
+                                   schedule_pending_image)
+from recipes.images import recipe_image_variants
+from recipes.models import (IMAGE_PENDING, Favorite, Ingredient,
+                            IngredientRecipeAmount, Recipe, Tag)
+from recipes.relations import get_request_relations
+from recipes.shopping_list import change_recipe_ingredients
 from users.serializers import CustomUserSerializer
+
+from .instrumentation import TimedSerializerMixin
 from .validators import ingredients_validator
 
 User = get_user_model()
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin,
+                    serializers.ModelSerializer):
     """Сериализатор для тэгов"""
     class Meta:
         model = Tag
@@ -18,7 +29,8 @@ class TagSerializer(serializers.ModelSerializer):
         lookup_field = 'slug'
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для ингредиентов"""
     class Meta:
         model = Ingredient
@@ -36,6 +48,7 @@ class CreateTagSerializer(serializers.ModelSerializer):
 
 class RecipeIngredient(serializers.ModelSerializer):
     """Сериализатор для создания ингредиентов в рецептах"""
+    id = serializers.IntegerField(source='ingredient_id')
 
     class Meta:
         model = IngredientRecipeAmount
@@ -57,7 +70,43 @@ class RecipeIngredientSerializerTest(serializers.HyperlinkedModelSerializer):
         read_only_fields = ('measurement_unit', 'name',)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии изображения рецепта"""
+
+    def to_representation(self, value):
+        return recipe_image_variants(value.name)
+
+
+class Base64ImageUploadField(serializers.CharField):
+    """Изображение в base64 принимается без декодирования.
+
+    Декодирование и проверка изображения выполняются в фоне,
+    здесь проверяются только заголовок data URI и размер.
+    """
+
+    def to_internal_value(self, data):
+        data = super().to_internal_value(data)
+        header, separator, encoded = data.partition(';base64,')
+        if not separator or not header.startswith('data:image/'):
+            raise serializers.ValidationError(
+                'Ожидается изображение в формате data:image/...;base64,')
+        check_image_size(len(encoded) * 3 // 4)
+        return data
+
+    def to_representation(self, value):
+        return value.name if value else None
+
+
+def check_image_size(size):
+    max_bytes = settings.RECIPE_IMAGE_MAX_BYTES
+    if size > max_bytes:
+        raise serializers.ValidationError(
+            f'Размер изображения не должен превышать '
+            f'{max_bytes // (1024 * 1024)} МБ')
+
+
+class RecipeSerializer(TimedSerializerMixin,
+                       serializers.ModelSerializer):
     """Сериализатор для рецептов"""
     tags = TagSerializer(many=True)
     ingredients = RecipeIngredientSerializerTest(
@@ -67,91 +116,166 @@ class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(max_length=None, use_url=False)
+    image_variants = ImageVariantsField(source='image')
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        if not user.is_anonymous:
-            return Favorite.objects.filter(
-                user=user,
-                recipe=obj).exists()
-        return False
+        relations = get_request_relations(self.context['request'])
+        return obj.pk in relations.favorites
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        if not user.is_anonymous:
-            return ShoppingCart.objects.filter(
-                user=user,
-                recipe=obj).exists()
-        return False
+        relations = get_request_relations(self.context['request'])
+        return obj.pk in relations.cart
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author',
                   'ingredients', 'is_favorited',
                   'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time')
+                  'image', 'image_variants', 'image_status',
+                  'text', 'cooking_time')
 
 
-class CreateRecipeSerializer(serializers.ModelSerializer):
+class CreateRecipeSerializer(TimedSerializerMixin,
+                             serializers.ModelSerializer):
     """Сериализатор для создания рецептов"""
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True,)
     ingredients = RecipeIngredient(many=True,
                                    source='ingredient_amount')
     author = CustomUserSerializer(read_only=True)
-    image = Base64ImageField(max_length=None, use_url=False)
+    image = Base64ImageUploadField(required=False)
+    image_token = serializers.CharField(write_only=True, required=False)
+    image_variants = ImageVariantsField(source='image')
 
     class Meta:
         model = Recipe
-        fields = ('__all__')
+        exclude = ('pending_image',)
+
+    def validate_ingredients(self, value):
+        ingredients_validator(value)
+        return value
+
+    def validate_image_token(self, value):
+        upload = find_upload(self.context['request'].user.pk, value)
+        if upload is None:
+            raise serializers.ValidationError(
+                'Загруженное изображение не найдено')
+        return upload
+
+    def validate(self, data):
+        if (self.instance is None and not data.get('image')
+                and not data.get('image_token')):
+            raise serializers.ValidationError(
+                {'image': 'Обязательное поле.'})
+        return data
+
+    def pop_image_upload(self, validated_data):
+        """Имя загруженного файла, который обработается в фоне"""
+        upload = validated_data.pop('image_token', None)
+        image = validated_data.pop('image', None)
+        if image:
+            upload = save_base64_upload(
+                self.context['request'].user.pk, image)
+        return upload
 
     def generate_recipe_ingr(self, ingredients_data, recipe):
-
-        ingredient_recipe_objs = []
-
-        for ingredient in ingredients_data:
-            ingredient_recipe_objs.append(
-                IngredientRecipeAmount(
-                    recipe=recipe,
-                    ingredient=Ingredient.objects.get(
-                        pk=ingredient['id']),
-                    amount=ingredient['amount'])
-            )
+        if not ingredients_data:
+            return []
         return IngredientRecipeAmount.objects.bulk_create(
-            ingredient_recipe_objs)
+            IngredientRecipeAmount(
+                recipe=recipe,
+                ingredient_id=ingredient['ingredient_id'],
+                amount=ingredient['amount'])
+            for ingredient in ingredients_data
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
-        ingredients = self.context['request'].data['ingredients']
         tags = validated_data.pop('tags')
-        validated_data.pop('ingredient_amount')
-        ingredients_validator(ingredients)
+        ingredients = validated_data.pop('ingredient_amount')
+        upload = self.pop_image_upload(validated_data)
 
         recipe = Recipe.objects.create(author=self.context['request'].user,
+                                       pending_image=upload,
+                                       image_status=IMAGE_PENDING,
                                        **validated_data)
         self.generate_recipe_ingr(ingredients, recipe)
         recipe.tags.set(tags)
+        schedule_pending_image(recipe.pk)
         return recipe
 
+    def update_recipe_ingr(self, ingredients_data, recipe):
+        """Изменяет только те строки ингредиентов, которые отличаются"""
+        current = {
+            row.ingredient_id: row for row in recipe.ingredient_amount.all()
+        }
+        incoming = {
+            ingredient['ingredient_id']: ingredient['amount']
+            for ingredient in ingredients_data
+        }
+        change_recipe_ingredients(
+            recipe,
+            {pk: row.amount for pk, row in current.items()},
+            incoming
+        )
+        removed = current.keys() - incoming.keys()
+        if removed:
+            IngredientRecipeAmount.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = incoming.get(ingredient_id)
+            if amount is not None and amount != row.amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            IngredientRecipeAmount.objects.bulk_update(changed, ['amount'])
+        added = self.generate_recipe_ingr(
+            [ingredient for ingredient in ingredients_data
+             if ingredient['ingredient_id'] not in current],
+            recipe
+        )
+        return bool(removed or changed or added)
+
+    def update_recipe_tags(self, tags, recipe):
+        current = {tag.pk for tag in recipe.tags.all()}
+        incoming = {tag.pk for tag in tags}
+        if current - incoming:
+            recipe.tags.remove(*(current - incoming))
+        if incoming - current:
+            recipe.tags.add(*(incoming - current))
+        return current != incoming
+
+    @transaction.atomic
     def update(self, instance, validated_data):
-        request = self.context['request']
-        ingredients = request.data['ingredients']
-
-        ingredients_validator(ingredients)
-
-        IngredientRecipeAmount.objects.filter(recipe=instance).delete()
-
-        self.generate_recipe_ingr(ingredients, instance)
-        try:
-            instance.image = validated_data['image']
-        except KeyError:
-            pass
-        instance.author = request.user
-        instance.tags.set(validated_data['tags'])
-        instance.text = validated_data['text']
-        instance.cooking_time = validated_data['cooking_time']
-        instance.name = validated_data['name']
-
-        instance.save()
+        ingredients = validated_data.pop('ingredient_amount', None)
+        tags = validated_data.pop('tags', None)
+        old_upload = instance.pending_image
+        upload = self.pop_image_upload(validated_data)
+        if upload:
+            validated_data['pending_image'] = upload
+            validated_data['image_status'] = IMAGE_PENDING
+
+        relations_changed = False
+        if ingredients is not None:
+            relations_changed |= self.update_recipe_ingr(ingredients, instance)
+        if tags is not None:
+            relations_changed |= self.update_recipe_tags(tags, instance)
+
+        changed_fields = []
+        for field, value in validated_data.items():
+            if getattr(instance, field) != value:
+                setattr(instance, field, value)
+                changed_fields.append(field)
+        if changed_fields or relations_changed:
+            instance.save(update_fields=changed_fields + ['updated_at'])
+        if upload:
+            # Повтор запроса с тем же image_token не удаляет файл,
+            # который ещё предстоит обработать.
+            if old_upload and old_upload != upload:
+                transaction.on_commit(
+                    lambda: default_storage.delete(old_upload))
+            schedule_pending_image(instance.pk)
         return instance
 
 
@@ -174,10 +298,7 @@ class FavoriteRecipeSerializer(RecipeSerializer):
 class FollowUserSerializer(CustomUserSerializer):
     """Сериализатор для вывода подписок"""
     recipes = FavoriteRecipeSerializer(many=True)
-    recipes_count = serializers.IntegerField(
-        source='recipes.count',
-        read_only=True
-    )
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -188,10 +309,6 @@ class FollowUserSerializer(CustomUserSerializer):
 
 
 class FollowUserCreateSerializer(FollowUserSerializer):
-    recipes_count = serializers.IntegerField(
-        source='recipes.count',
-        read_only=True
-    )
 
     class Meta:
         model = User
@@ -203,3 +320,21 @@ class FollowUserCreateSerializer(FollowUserSerializer):
 
 class ShoppingCartRecipeSerializer(FavoriteRecipeSerializer):
     """Сериализатор рецептов для ответа при создании записи в корзине"""
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка рецептов для пакетных операций"""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        min_length=1,
+        max_length=100,
+    )
+
+
+class RecipeImageUploadSerializer(serializers.Serializer):
+    """Сериализатор загрузки изображения рецепта файлом"""
+    image = serializers.FileField()
+
+    def validate_image(self, value):
+        check_image_size(value.size)
+        return value
@@ -0,0 +1,79 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientRecipeAmount, Recipe, Tag
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='user', email='user@example.com', password='password')
+
+
+@pytest.fixture
+def author(django_user_model):
+    return django_user_model.objects.create_user(
+        username='author', email='author@example.com', password='password')
+
+
+@pytest.fixture
+def anon_client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def tags():
+    return [
+        Tag.objects.create(name=f'Тег {number}', slug=f'tag-{number}',
+                           color=f'#00000{number}')
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients():
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+        for number in range(10)
+    )
+    return list(Ingredient.objects.order_by('pk'))
+
+
+@pytest.fixture
+def make_recipes(author, tags, ingredients):
+    """Создаёт count рецептов автора с тегами и пятью ингредиентами"""
+    def make(count, recipe_author=None, recipe_tags=None):
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=recipe_author or author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10)
+            recipe.tags.set(recipe_tags or tags[:2])
+            IngredientRecipeAmount.objects.bulk_create(
+                IngredientRecipeAmount(
+                    recipe=recipe, ingredient=ingredient,
+                    amount=number + index + 1)
+                for index, ingredient in enumerate(
+                    ingredients[number % 5:number % 5 + 5])
+            )
+            recipes.append(recipe)
+        return recipes
+    return make
@@ -0,0 +1,50 @@
+import pytest
+
+from recipes.models import ShoppingCart, ShoppingListItem
+from recipes.shopping_list import change_cart
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('model', ['favorite', 'shoppingcart',
+                                   'ingredientrecipeamount'])
+def test_relation_admins_are_read_only(admin_client, model):
+    assert admin_client.get(f'/admin/recipes/{model}/').status_code == 200
+    assert admin_client.get(
+        f'/admin/recipes/{model}/add/').status_code == 403
+
+
+@pytest.mark.django_db
+def test_ingredient_inline_updates_shopping_lists(
+        admin_client, user, make_recipes, ingredients):
+    recipe = make_recipes(1)[0]
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    change_cart(user, [recipe.pk], 1)
+    rows = list(recipe.ingredient_amount.order_by('pk'))
+    data = {
+        'name': recipe.name, 'text': recipe.text,
+        'author': recipe.author_id, 'cooking_time': recipe.cooking_time,
+        'tags': [tag.pk for tag in recipe.tags.all()],
+        'ingredient_amount-TOTAL_FORMS': len(rows) + 1,
+        'ingredient_amount-INITIAL_FORMS': len(rows),
+        'ingredient_amount-MIN_NUM_FORMS': 1,
+        'ingredient_amount-MAX_NUM_FORMS': 1000,
+    }
+    for index, row in enumerate(rows):
+        prefix = f'ingredient_amount-{index}'
+        data.update({f'{prefix}-id': row.pk, f'{prefix}-recipe': recipe.pk,
+                     f'{prefix}-ingredient': row.ingredient_id,
+                     f'{prefix}-amount': row.amount})
+    data['ingredient_amount-0-amount'] = 100
+    data['ingredient_amount-1-DELETE'] = 'on'
+    data.update({f'ingredient_amount-{len(rows)}-recipe': recipe.pk,
+                 f'ingredient_amount-{len(rows)}-ingredient':
+                     ingredients[9].pk,
+                 f'ingredient_amount-{len(rows)}-amount': 7})
+    response = admin_client.post(
+        f'/admin/recipes/recipe/{recipe.pk}/change/', data)
+    assert response.status_code == 302
+    expected = dict(recipe.ingredient_amount.values_list(
+        'ingredient_id', 'amount'))
+    assert expected[rows[0].ingredient_id] == 100
+    assert dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient_id', 'amount')) == expected
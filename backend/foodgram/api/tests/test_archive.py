@@ -0,0 +1,82 @@
+import os
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from recipes.archive import CHECKPOINT_FILE, RecipeImporter
+from recipes.models import Ingredient, IngredientRecipeAmount, Recipe, Tag
+
+
+def snapshot():
+    """Рецепты в виде, не зависящем от первичных ключей"""
+    return {
+        recipe.name: {
+            'author': (recipe.author.username, recipe.author.email),
+            'pub_date': recipe.pub_date,
+            'tags': sorted((tag.slug, tag.name, tag.color)
+                           for tag in recipe.tags.all()),
+            'ingredients': sorted(
+                (row.ingredient.name, row.ingredient.measurement_unit,
+                 row.amount)
+                for row in recipe.ingredient_amount.all()),
+        }
+        for recipe in Recipe.objects.with_related()
+    }
+
+
+@pytest.fixture
+def archive(tmp_path, author, make_recipes):
+    """Выгружает пять рецептов и удаляет их вместе с авторами, тегами
+    и ингредиентами"""
+    now = timezone.now()
+    for number, recipe in enumerate(make_recipes(5)):
+        Recipe.objects.filter(pk=recipe.pk).update(
+            pub_date=now - timedelta(days=number + 1))
+    expected = snapshot()
+    path = str(tmp_path / 'archive')
+    call_command('export_recipes', path, '--no-images', stdout=StringIO())
+    author.delete()
+    Tag.objects.all().delete()
+    Ingredient.objects.all().delete()
+    assert not Recipe.objects.exists()
+    return path, expected
+
+
+@pytest.mark.django_db
+def test_export_import_round_trip(archive):
+    path, expected = archive
+    call_command('import_recipes', path, '--restart', '--no-images',
+                 stdout=StringIO())
+    assert snapshot() == expected
+
+
+@pytest.mark.django_db
+def test_interrupted_import_resumes_without_duplicates(archive,
+                                                       monkeypatch):
+    path, expected = archive
+    manager = IngredientRecipeAmount.objects
+    bulk_create = manager.bulk_create
+    calls = []
+
+    def fail_in_second_batch(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise OSError('Диск переполнен')
+        return bulk_create(*args, **kwargs)
+
+    monkeypatch.setattr(manager, 'bulk_create', fail_in_second_batch)
+    importer = RecipeImporter(path, batch_size=2, with_images=False)
+    with pytest.raises(OSError):
+        importer.run()
+    # Первая пачка зафиксирована, вторая откатилась целиком.
+    assert Recipe.objects.count() == 2
+    assert importer.read_checkpoint() == 2
+
+    monkeypatch.undo()
+    assert RecipeImporter(path, batch_size=2, with_images=False).run() == 3
+    assert snapshot() == expected
+    assert Recipe.objects.count() == 5
+    assert not os.path.exists(os.path.join(path, CHECKPOINT_FILE))
@@ -0,0 +1,41 @@
+import pytest
+
+from recipes.models import Favorite, Recipe, ShoppingCart, ShoppingListItem
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('model, path, field', [
+    (Favorite, 'favorite', 'favorites_count'),
+    (ShoppingCart, 'shopping_cart', 'in_carts_count'),
+])
+def test_batch_add_and_remove(user, user_client, make_recipes, model, path,
+                              field):
+    recipes = make_recipes(3)
+    ids = [recipe.pk for recipe in recipes]
+    url = f'/api/recipes/{path}/'
+    response = user_client.post(url, {'recipes': ids[:2]}, format='json')
+    assert [result['status'] for result in response.data['results']] == [
+        'created', 'created']
+
+    missing = max(ids) + 1
+    response = user_client.delete(
+        url, {'recipes': [ids[0], ids[2], missing]}, format='json')
+    assert response.status_code == 200
+    assert response.data['results'] == [
+        {'id': ids[0], 'status': 'deleted'},
+        {'id': ids[2], 'status': 'absent'},
+        {'id': missing, 'status': 'not_found'},
+    ]
+    assert list(model.objects.filter(user=user).values_list(
+        'recipe_id', flat=True)) == [ids[1]]
+    counters = dict(Recipe.objects.values_list('pk', field))
+    assert counters == {ids[0]: 0, ids[1]: 1, ids[2]: 0}
+
+
+@pytest.mark.django_db
+def test_batch_remove_updates_shopping_list(user, user_client, make_recipes):
+    ids = [recipe.pk for recipe in make_recipes(2)]
+    url = '/api/recipes/shopping_cart/'
+    user_client.post(url, {'recipes': ids}, format='json')
+    user_client.delete(url, {'recipes': ids}, format='json')
+    assert not ShoppingListItem.objects.filter(user=user).exists()
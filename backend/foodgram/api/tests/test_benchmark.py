@@ -0,0 +1,46 @@
+import pytest
+
+from api.benchmark import BenchmarkRunner
+from recipes.seeding import BenchmarkSeeder
+
+
+@pytest.fixture
+def seeded():
+    BenchmarkSeeder('bench', batch_size=50).run(
+        users=3, recipes=30, tags=3, ingredients=10,
+        ingredients_per_recipe=3, follows_per_user=1,
+        favorites_per_user=2, carts_per_user=1)
+
+
+@pytest.mark.django_db
+def test_refuses_to_run_without_seeded_data(user, make_recipes):
+    make_recipes(2)
+    with pytest.raises(ValueError, match='--allow-writes'):
+        BenchmarkRunner(iterations=1, memory_iterations=0).run()
+
+
+@pytest.mark.django_db
+def test_runs_on_other_data_with_allow_writes(user, make_recipes):
+    make_recipes(2)
+    runner = BenchmarkRunner(iterations=1, memory_iterations=0,
+                             allow_writes=True)
+    assert 'recipe_detail' in runner.run(['recipe_detail'])
+
+
+@pytest.mark.django_db
+def test_response_cache_is_disabled_by_default(seeded):
+    runner = BenchmarkRunner(iterations=4, memory_iterations=0)
+    assert runner.data.user.username.startswith('bench_')
+    result = runner.run(['recipe_feed'])['recipe_feed']
+    assert 'latency_ms_by_cache' not in result
+    assert result['queries']['min'] > 0
+
+
+@pytest.mark.django_db
+def test_response_cache_hits_and_misses_are_reported_separately(seeded):
+    runner = BenchmarkRunner(iterations=20, memory_iterations=0,
+                             response_cache=True)
+    by_cache = runner.run(['recipe_feed'])['recipe_feed'][
+        'latency_ms_by_cache']
+    assert by_cache['hit']['requests'] + by_cache.get(
+        'miss', {'requests': 0})['requests'] == 20
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+from django.db import connection
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Follow, IngredientRecipeAmount, Recipe,
+                            ShoppingCart, ShoppingListItem)
+
+THREADS = 8
+
+
+def post_in_parallel(user, path, data=None):
+    """Отправляет THREADS одинаковых POST одновременно из разных потоков
+    и возвращает ответы"""
+    barrier = threading.Barrier(THREADS)
+    responses = []
+
+    def post():
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            barrier.wait()
+            responses.append(client.post(path, data, format='json'))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=post) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def sorted_statuses(responses):
+    return sorted(response.status_code for response in responses)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('model, path, field', [
+    (Favorite, 'favorite', 'favorites_count'),
+    (ShoppingCart, 'shopping_cart', 'in_carts_count'),
+])
+def test_parallel_recipe_relation_posts(user, make_recipes, model, path,
+                                        field):
+    recipe = make_recipes(1)[0]
+    responses = post_in_parallel(user, f'/api/recipes/{recipe.pk}/{path}/')
+    assert sorted_statuses(responses) == [201] + [400] * (THREADS - 1)
+    assert model.objects.filter(user=user, recipe=recipe).count() == 1
+    assert getattr(Recipe.objects.get(pk=recipe.pk), field) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_subscribe_posts(user, author):
+    responses = post_in_parallel(user, f'/api/users/{author.pk}/subscribe/')
+    assert sorted_statuses(responses) == [201] + [400] * (THREADS - 1)
+    assert Follow.objects.filter(user=user, author=author).count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_parallel_cart_batch_adds_each_recipe_once(user, make_recipes):
+    recipes = make_recipes(2)
+    ids = [recipe.pk for recipe in recipes]
+    responses = post_in_parallel(
+        user, '/api/recipes/shopping_cart/', {'recipes': ids})
+    assert sorted_statuses(responses) == [200] * THREADS
+    created = [result['id'] for response in responses
+               for result in response.data['results']
+               if result['status'] == 'created']
+    assert sorted(created) == ids
+    assert ShoppingCart.objects.filter(user=user).count() == 2
+    assert all(recipe.in_carts_count == 1
+               for recipe in Recipe.objects.filter(pk__in=ids))
+    expected = {}
+    for line in IngredientRecipeAmount.objects.filter(recipe_id__in=ids):
+        expected[line.ingredient_id] = (
+            expected.get(line.ingredient_id, 0) + line.amount)
+    assert dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient_id', 'amount')) == expected
@@ -0,0 +1,73 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Favorite
+
+RECIPES_URL = '/api/recipes/'
+
+
+def revalidate(client, path, params=None):
+    response = client.get(path, params)
+    assert response.status_code == 200
+    return client.get(path, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+
+@pytest.mark.django_db
+def test_list_validators_do_not_query_database(anon_client, make_recipes):
+    make_recipes(3)
+    anon_client.get(RECIPES_URL, {'pagination': 'cursor'})
+    with CaptureQueriesContext(connection) as captured:
+        response = anon_client.get(RECIPES_URL, {'pagination': 'cursor'})
+    assert response['X-Cache'] == 'HIT'
+    assert not captured.captured_queries
+
+
+@pytest.mark.django_db
+def test_cursor_page_does_not_count_recipes(user_client, make_recipes):
+    make_recipes(3)
+    with CaptureQueriesContext(connection) as captured:
+        user_client.get(RECIPES_URL, {'pagination': 'cursor'})
+    assert not any('COUNT(' in query['sql'].upper()
+                   for query in captured.captured_queries)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_list_etag_changes_after_recipe_write(user_client, make_recipes):
+    recipes = make_recipes(2)
+    assert revalidate(user_client, RECIPES_URL).status_code == 304
+    etag = user_client.get(RECIPES_URL)['ETag']
+    assert user_client.get(RECIPES_URL, {'limit': 1})['ETag'] != etag
+    recipes[0].name = 'Новое название'
+    recipes[0].save()
+    response = user_client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+def test_counter_ordering_is_not_conditional(
+        anon_client, make_recipes, django_user_model):
+    recipe = make_recipes(2)[0]
+    params = {'ordering': '-favorites_count'}
+    response = anon_client.get(RECIPES_URL, params)
+    assert not response.has_header('ETag')
+    assert response.data['results'][0]['id'] != recipe.pk
+    fan = django_user_model.objects.create_user(
+        username='fan', email='fan@example.com', password='password')
+    anon_client.force_authenticate(fan)
+    anon_client.post(f'{RECIPES_URL}{recipe.pk}/favorite/')
+    assert Favorite.objects.filter(recipe=recipe).exists()
+    anon_client.force_authenticate(None)
+    results = anon_client.get(RECIPES_URL, params).data['results']
+    assert results[0]['id'] == recipe.pk
+
+
+@pytest.mark.django_db(transaction=True)
+def test_detail_etag_follows_updated_at(user_client, make_recipes):
+    recipe = make_recipes(1)[0]
+    path = f'{RECIPES_URL}{recipe.pk}/'
+    assert revalidate(user_client, path).status_code == 304
+    etag = user_client.get(path)['ETag']
+    recipe.save()
+    response = user_client.get(path, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
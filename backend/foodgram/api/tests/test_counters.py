@@ -0,0 +1,43 @@
+import pytest
+
+from recipes.counters import recount_recipe_counters
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('model, path, field', [
+    (Favorite, 'favorite', 'favorites_count'),
+    (ShoppingCart, 'shopping_cart', 'in_carts_count'),
+])
+def test_delete_does_not_take_counter_below_zero(
+        user, user_client, make_recipes, model, path, field):
+    recipe = make_recipes(1)[0]
+    # Связь создана в обход API, счётчик остался нулевым.
+    model.objects.create(user=user, recipe=recipe)
+    response = user_client.delete(f'/api/recipes/{recipe.pk}/{path}/')
+    assert response.status_code == 204
+    assert getattr(Recipe.objects.get(pk=recipe.pk), field) == 0
+
+
+@pytest.mark.django_db
+def test_recount_fixes_drifted_counters(django_user_model, make_recipes):
+    recipes = make_recipes(5)
+    users = [
+        django_user_model.objects.create_user(
+            username=f'reader{number}', email=f'reader{number}@example.com')
+        for number in range(3)
+    ]
+    for user in users:
+        Favorite.objects.create(user=user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=user, recipe=recipes[0])
+    Favorite.objects.create(user=users[0], recipe=recipes[4])
+    Recipe.objects.filter(pk=recipes[1].pk).update(
+        favorites_count=7, in_carts_count=2)
+
+    assert recount_recipe_counters(Recipe, batch_size=2) == 5
+    assert dict(Recipe.objects.values_list('pk', 'favorites_count')) == {
+        recipes[0].pk: 3, recipes[1].pk: 0, recipes[2].pk: 0,
+        recipes[3].pk: 0, recipes[4].pk: 1}
+    assert dict(Recipe.objects.values_list('pk', 'in_carts_count')) == {
+        recipes[0].pk: 3, recipes[1].pk: 0, recipes[2].pk: 0,
+        recipes[3].pk: 0, recipes[4].pk: 0}
@@ -0,0 +1,49 @@
+import io
+import os
+
+import pytest
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipes.image_uploads import save_upload, upload_name
+from recipes.images import recipe_image_files, store_recipe_image
+from recipes.models import IMAGE_PENDING, IMAGE_READY, Recipe
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), 'red').save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+def test_images_are_stored_under_mounted_media_dir():
+    name = store_recipe_image(png())
+    assert name.startswith('media/recipes/')
+    for file_name in recipe_image_files(name):
+        assert os.path.isfile(os.path.join(settings.MEDIA_ROOT, file_name))
+
+
+def test_uploads_are_stored_under_mounted_media_dir():
+    token = save_upload(1, png())
+    name = upload_name(1, token)
+    assert name.startswith('media/uploads/')
+    assert os.path.isfile(os.path.join(settings.MEDIA_ROOT, name))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_retried_image_token_keeps_pending_upload(author, make_recipes):
+    recipe = make_recipes(1)[0]
+    token = save_upload(author.pk, png())
+    Recipe.objects.filter(pk=recipe.pk).update(
+        pending_image=upload_name(author.pk, token),
+        image_status=IMAGE_PENDING)
+    client = APIClient()
+    client.force_authenticate(author)
+    response = client.patch(f'/api/recipes/{recipe.pk}/',
+                            {'image_token': token}, format='json')
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    assert recipe.image_status == IMAGE_READY
+    assert recipe.image.name.startswith('media/recipes/')
@@ -0,0 +1,33 @@
+import pytest
+from django.db import transaction
+
+from recipes.catalog import IngredientCatalog
+from recipes.models import Ingredient
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reload_replaces_snapshot_without_touching_old_one(ingredients):
+    catalog = IngredientCatalog()
+    old = catalog.snapshot()
+    assert [item['name'] for item in catalog.search('ингредиент 1', 5)] == [
+        'Ингредиент 1']
+
+    with transaction.atomic():
+        Ingredient.objects.create(name='Ингредиент 10', measurement_unit='г')
+    new = catalog.snapshot()
+    assert new is not old
+    assert len(old.items) == len(old.names) == len(old.sorted_items) == 10
+    assert len(new.items) == len(new.names) == len(new.sorted_items) == 11
+    assert [item['name'] for item in catalog.search('ингредиент 1', 5)] == [
+        'Ингредиент 1', 'Ингредиент 10']
+    assert catalog.snapshot() is new
+
+
+@pytest.mark.django_db
+def test_ingredients_endpoint_serves_catalog(anon_client, ingredients):
+    response = anon_client.get('/api/ingredients/', {'name': 'ингредиент 3'})
+    assert response.status_code == 200
+    assert response.json() == [{
+        'id': ingredients[3].pk, 'name': 'Ингредиент 3',
+        'measurement_unit': 'г'}]
+    assert len(anon_client.get('/api/ingredients/').json()) == 10
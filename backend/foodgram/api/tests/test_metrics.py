@@ -0,0 +1,48 @@
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+METRICS_URL = '/metrics'
+
+
+def scrape(client):
+    response = client.get(METRICS_URL)
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/plain')
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(
+            response.content.decode())
+        for sample in family.samples
+    }
+
+
+def sample(samples, name, **labels):
+    return samples.get((name, tuple(sorted(labels.items()))), 0)
+
+
+@pytest.mark.django_db
+def test_scrape_reports_recipe_list_and_cache_metrics(anon_client,
+                                                      make_recipes):
+    make_recipes(2)
+    latency = dict(name='foodgram_http_request_duration_seconds_count',
+                   view='RecipeViewSet.list', method='GET', status='200')
+    queries = dict(name='foodgram_db_queries_total',
+                   view='RecipeViewSet.list')
+    hits = dict(name='foodgram_cache_requests_total',
+                cache='recipe_response', result='hit')
+    misses = dict(hits, result='miss')
+    before = scrape(anon_client)
+
+    anon_client.get('/api/recipes/')
+    anon_client.get('/api/recipes/')
+    after = scrape(anon_client)
+
+    assert sample(after, **latency) - sample(before, **latency) == 2
+    assert sample(after, **queries) > sample(before, **queries)
+    assert sample(after, **misses) - sample(before, **misses) == 1
+    assert sample(after, **hits) - sample(before, **hits) == 1
+
+
+def test_metrics_disabled(anon_client, settings):
+    settings.METRICS_ENABLED = False
+    assert anon_client.get(METRICS_URL).status_code == 404
@@ -0,0 +1,103 @@
+import pytest
+from django.db import connection
+from django.http import QueryDict
+from django.test.utils import CaptureQueriesContext
+
+from api.filters import RecipeFilter
+from recipes.models import IMAGE_READY, Recipe, Tag
+
+RECIPES_URL = '/api/recipes/'
+SCALE_RECIPES = 100_000
+SCALE_TAGS = 20
+
+
+def collect_pages(client, url):
+    ids, count = [], None
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        count = response.data['count']
+        ids.extend(recipe['id'] for recipe in response.data['results'])
+        url = response.data['next']
+    return ids, count
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [
+    'tags=tag-0,tag-1',
+    'tags=tag-0&tags=tag-1',
+])
+def test_multi_tag_filter_has_no_duplicates(anon_client, make_recipes, tags,
+                                            params):
+    matching = make_recipes(8)
+    make_recipes(2, recipe_tags=tags[2:])
+    ids, count = collect_pages(anon_client, f'{RECIPES_URL}?{params}')
+    assert count == len(matching)
+    assert sorted(ids) == sorted(recipe.pk for recipe in matching)
+    last_page = anon_client.get(f'{RECIPES_URL}?{params}&page=2')
+    assert len(last_page.data['results']) == 2
+    assert last_page.data['next'] is None
+
+
+@pytest.fixture
+def catalog_at_scale(author):
+    """100 тысяч рецептов с одним-двумя из 20 тегов. Строки создаются
+    запросами generate_series: через ORM это заняло бы минуты."""
+    tag_ids = [
+        Tag.objects.create(name=f'Тег {number}', slug=f'scale-{number}',
+                           color=f'#0000{number:02d}').pk
+        for number in range(SCALE_TAGS)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO recipes_recipe (name, text, pub_date, updated_at, '
+            'author_id, image, image_status, pending_image, cooking_time, '
+            'favorites_count, in_carts_count) '
+            "SELECT 'Рецепт ' || n, 'Описание', "
+            "now() - n * interval '1 minute', now(), %s, '', %s, '', 10, "
+            '0, 0 FROM generate_series(1, %s) AS n',
+            [author.pk, IMAGE_READY, SCALE_RECIPES])
+        cursor.execute(
+            'INSERT INTO recipes_recipe_tags (recipe_id, tag_id) '
+            'SELECT id, (%(tags)s::int[])[1 + id %% %(count)s] '
+            'FROM recipes_recipe UNION '
+            'SELECT id, (%(tags)s::int[])[1 + id / %(count)s %% %(count)s] '
+            'FROM recipes_recipe WHERE id %% 2 = 0',
+            {'tags': tag_ids, 'count': SCALE_TAGS})
+        # Как в рабочей базе после автоочистки: статистика собрана,
+        # карта видимости позволяет сканировать только индекс.
+        cursor.execute('VACUUM ANALYZE recipes_recipe')
+        cursor.execute('VACUUM ANALYZE recipes_recipe_tags')
+        cursor.execute('VACUUM ANALYZE recipes_tag')
+
+
+@pytest.mark.skipif(connection.vendor != 'postgresql',
+                    reason='План запроса проверяется только в PostgreSQL')
+@pytest.mark.django_db(transaction=True)
+def test_tag_filter_uses_indexes(catalog_at_scale):
+    queryset = RecipeFilter(
+        QueryDict('tags=scale-0,scale-1'),
+        queryset=Recipe.objects.order_by('-pub_date', '-id'),
+    ).qs[:6]
+    plan = queryset.explain()
+    assert 'Index Scan using recipe_pub_date_id_idx' in plan
+    assert 'Index Only Scan using recipe_tags_tag_recipe_idx' in plan
+    assert 'Seq Scan on recipes_recipe ' not in plan
+    assert 'Seq Scan on recipes_recipe_tags' not in plan
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('field', ['favorites_count', 'in_carts_count'])
+def test_counter_ordering_pages_are_stable(anon_client, make_recipes, field):
+    recipes = make_recipes(8)
+    popular = recipes[2]
+    Recipe.objects.filter(pk=popular.pk).update(**{field: 1})
+    with CaptureQueriesContext(connection) as captured:
+        ids, count = collect_pages(
+            anon_client, f'{RECIPES_URL}?ordering=-{field}')
+    others = sorted((recipe.pk for recipe in recipes
+                     if recipe.pk != popular.pk), reverse=True)
+    assert ids == [popular.pk, *others]
+    assert count == len(recipes)
+    assert any(f'"{field}" DESC, "recipes_recipe"."id" DESC' in query['sql']
+               for query in captured.captured_queries)
@@ -0,0 +1,62 @@
+import pytest
+
+from recipes.models import Favorite, ShoppingCart
+
+RECIPES_URL = '/api/recipes/'
+
+
+@pytest.fixture
+def relations(user, author):
+    """Связи пользователя, которые сериализатор отмечает флагами"""
+    def make(recipes):
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=recipe) for recipe in recipes)
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=user, recipe=recipe) for recipe in recipes)
+        user.follower.create(author=author)
+    return make
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('page_size', [1, 6])
+def test_list_anonymous(anon_client, make_recipes, django_assert_num_queries,
+                        page_size):
+    make_recipes(page_size)
+    with django_assert_num_queries(4):
+        response = anon_client.get(RECIPES_URL)
+    assert len(response.data['results']) == page_size
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('page_size', [1, 6])
+def test_list_authenticated(user_client, make_recipes, relations,
+                            django_assert_num_queries, page_size):
+    relations(make_recipes(page_size))
+    with django_assert_num_queries(5):
+        response = user_client.get(RECIPES_URL)
+    results = response.data['results']
+    assert len(results) == page_size
+    assert all(recipe['is_favorited'] and recipe['is_in_shopping_cart']
+               and recipe['author']['is_subscribed'] for recipe in results)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('catalog_size', [1, 6])
+def test_detail_anonymous(anon_client, make_recipes, django_assert_num_queries,
+                          catalog_size):
+    recipe = make_recipes(catalog_size)[-1]
+    with django_assert_num_queries(4):
+        response = anon_client.get(f'{RECIPES_URL}{recipe.pk}/')
+    assert response.data['id'] == recipe.pk
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('catalog_size', [1, 6])
+def test_detail_authenticated(user_client, make_recipes, relations,
+                              django_assert_num_queries, catalog_size):
+    recipe = make_recipes(catalog_size)[-1]
+    relations([recipe])
+    with django_assert_num_queries(5):
+        response = user_client.get(f'{RECIPES_URL}{recipe.pk}/')
+    assert response.data['is_favorited'] is True
+    assert response.data['author']['is_subscribed'] is True
@@ -0,0 +1,44 @@
+import pytest
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import Favorite
+from recipes.relations import (get_user_relations, load_relations,
+                               relations_cache_key, relations_changed)
+from recipes.versions import get_version, user_relations_key
+
+
+@pytest.mark.django_db
+def test_relations_are_loaded_in_one_query(
+        user, author, make_recipes, django_assert_num_queries):
+    recipe = make_recipes(1)[0]
+    Favorite.objects.create(user=user, recipe=recipe)
+    user.follower.create(author=author)
+    with django_assert_num_queries(1):
+        relations = load_relations(user.pk)
+    assert relations == {'favorites': {recipe.pk}, 'cart': set(),
+                         'following': {author.pk}}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stale_set_from_concurrent_miss_is_not_used(user, make_recipes):
+    recipe = make_recipes(1)[0]
+    old_key = relations_cache_key(
+        user.pk, get_version(user_relations_key(user.pk)))
+    stale = load_relations(user.pk)
+    with transaction.atomic():
+        Favorite.objects.create(user=user, recipe=recipe)
+        relations_changed(user)
+    # Параллельный запрос записал множества, прочитанные до изменения.
+    cache.set(old_key, stale)
+    assert recipe.pk in get_user_relations(user).favorites
+
+
+@pytest.mark.django_db(transaction=True)
+def test_is_favorited_follows_added_favorite(user_client, make_recipes):
+    recipe = make_recipes(1)[0]
+    path = f'/api/recipes/{recipe.pk}/'
+    assert user_client.get(path).data['is_favorited'] is False
+    response = user_client.post(f'/api/recipes/{recipe.pk}/favorite/')
+    assert response.status_code == 201
+    assert user_client.get(path).data['is_favorited'] is True
@@ -0,0 +1,79 @@
+import pytest
+
+from recipes.models import (IngredientRecipeAmount, ShoppingCart,
+                            ShoppingListItem)
+from recipes.shopping_list import change_cart, rebuild_shopping_lists
+
+DOWNLOAD_URL = '/api/recipes/download_shopping_cart/'
+
+
+def download(client, file_format='txt'):
+    response = client.get(DOWNLOAD_URL, {'format': file_format})
+    assert response.status_code == 200
+    return b''.join(response.streaming_content).decode()
+
+
+def fill_cart(client, recipes):
+    for recipe in recipes:
+        response = client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        assert response.status_code == 201
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cart_size', [1, 40])
+def test_download_uses_constant_number_of_queries(
+        user_client, make_recipes, django_assert_num_queries, cart_size):
+    fill_cart(user_client, make_recipes(cart_size))
+    with django_assert_num_queries(1):
+        download(user_client)
+
+
+@pytest.mark.django_db
+def test_download_sums_amounts_per_ingredient(user_client, make_recipes):
+    recipes = make_recipes(3)
+    fill_cart(user_client, recipes)
+    content = download(user_client, 'csv')
+    for row in IngredientRecipeAmount.objects.filter(
+            recipe__in=recipes).values('ingredient__name').distinct():
+        name = row['ingredient__name']
+        total = sum(IngredientRecipeAmount.objects.filter(
+            recipe__in=recipes, ingredient__name=name
+        ).values_list('amount', flat=True))
+        assert f'{name},{total},г' in content
+
+
+@pytest.mark.django_db
+def test_download_requires_authentication(anon_client):
+    assert anon_client.get(DOWNLOAD_URL).status_code == 401
+
+
+def shopping_lists():
+    return set(ShoppingListItem.objects.values_list(
+        'user_id', 'ingredient_id', 'amount'))
+
+
+@pytest.mark.django_db
+def test_rebuild_fixes_only_mismatched_rows(user, author, make_recipes,
+                                            ingredients):
+    recipes = make_recipes(3)
+    ShoppingCart.objects.create(user=user, recipe=recipes[0])
+    change_cart(user, [recipes[0].pk], 1)
+    for recipe in recipes[:2]:
+        ShoppingCart.objects.create(user=author, recipe=recipe)
+    change_cart(author, [recipe.pk for recipe in recipes[:2]], 1)
+    expected = shopping_lists()
+
+    items = ShoppingListItem.objects.filter(user=author).order_by('pk')
+    kept = items[0]
+    ShoppingListItem.objects.filter(pk=items[1].pk).update(amount=999)
+    items[2].delete()
+    ShoppingListItem.objects.create(
+        user=user, ingredient=ingredients[9], amount=5)
+
+    assert rebuild_shopping_lists(fix=False, batch_size=1)
+    mismatches = rebuild_shopping_lists(batch_size=1)
+    assert len(mismatches) == 3
+    assert (user.pk, ingredients[9].pk, 5, 0) in mismatches
+    assert shopping_lists() == expected
+    assert ShoppingListItem.objects.filter(pk=kept.pk).exists()
+    assert rebuild_shopping_lists() == []
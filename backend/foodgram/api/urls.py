@@ -1,9 +1,10 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (CartViewSet, FavoriteViewSet,
-                       FollowCreateDestroyViewSet, FollowListViewSet,
-                       IngredientsViewSet, RecipeViewSet, TagsViewSet)
+from api.views import (CartBatchViewSet, CartViewSet, FavoriteBatchViewSet,
+                       FavoriteViewSet, FollowCreateDestroyViewSet,
+                       FollowListViewSet, IngredientsViewSet,
+                       RecipeImageUploadViewSet, RecipeViewSet, TagsViewSet)
 
 router = DefaultRouter()
 
@@ -38,5 +39,15 @@ router.register('recipes',
 
 
 urlpatterns = [
+    path('recipes/images/',
+         RecipeImageUploadViewSet.as_view({'post': 'create'}),
+         name='recipe_image_upload'),
+    # Batch
+    path('recipes/shopping_cart/',
+         CartBatchViewSet.as_view({'post': 'create', 'delete': 'remove'}),
+         name='shopping_cart_batch'),
+    path('recipes/favorite/',
+         FavoriteBatchViewSet.as_view({'post': 'create', 'delete': 'remove'}),
+         name='favorite_batch'),
     path('', include(router.urls)),
 ]
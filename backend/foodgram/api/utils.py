@@ -1,24 +1,100 @@
-from recipes.models import IngredientRecipeAmount, ShoppingCart
-
-
-def generate_shopping_list(user):
-    ing_list = {}
-    text = 'Ваш список покупок: \n\n'
-    recipes_in_shopping_cart = ShoppingCart.objects.filter(user=user)
-    for recipe in recipes_in_shopping_cart:
-        ingredient_recipe = IngredientRecipeAmount.objects.filter(
-            recipe=recipe.recipe)
-        for element in ingredient_recipe:
-            if element.ingredient.name in ing_list:
-                ing_list[element.ingredient.name]['Количество'] += (
-                    element.amount)
-            else:
-                ing_list.update(
-                    {element.ingredient.name: {
-                        'Количество': element.amount,
-                        'Единицы': element.ingredient.measurement_unit}})
-    for ing in ing_list:
-        amount = ing_list[ing]['Количество']
-        unit = ing_list[ing]['Единицы']
-        text += ing + ' ' + str(amount) + ' ' + unit + '\n'
-    return text
+from django.db import connections, router
+from django.db.models import AutoField, Count, F, Prefetch
+from django.db.models.sql import InsertQuery
+
+from recipes.models import Recipe, ShoppingListItem
+
+
+def get_shopping_list_ingredients(user):
+    """Список покупок из заранее агрегированной таблицы одним запросом"""
+    return (
+        ShoppingListItem.objects
+        .filter(user=user)
+        .values(name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit'),
+                total_amount=F('amount'))
+        .order_by('name', 'measurement_unit')
+    )
+
+
+def annotate_subscriptions(authors, recipes_limit=None):
+    """Готовит авторов из подписок к выводу фиксированным числом запросов:
+    recipes_count считается в SQL, рецепты ограничиваются recipes_limit"""
+    recipes = Recipe.objects.order_by('-pub_date', '-pk')
+    if recipes_limit is not None:
+        recipes = recipes.limit_per_author(recipes_limit)
+    return authors.annotate(
+        recipes_count=Count('recipes'),
+    ).prefetch_related(Prefetch('recipes', queryset=recipes))
+
+
+def get_recipes_limit(request):
+    try:
+        recipes_limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return max(recipes_limit, 0)
+
+
+def insert_statements(model, objs, using, batch_size=None):
+    """SQL INSERT ... ON CONFLICT DO NOTHING по пачкам объектов"""
+    connection = connections[using]
+    fields = [field for field in model._meta.concrete_fields
+              if not isinstance(field, AutoField)]
+    if batch_size is None:
+        batch_size = max(connection.ops.bulk_batch_size(fields, objs), 1)
+    for start in range(0, len(objs), batch_size):
+        batch = objs[start:start + batch_size]
+        query = InsertQuery(model, ignore_conflicts=True)
+        query.insert_values(fields, batch)
+        for sql, params in query.get_compiler(using=using).as_sql():
+            yield batch, sql, params
+
+
+def insert_ignore_conflicts(model, objs):
+    """INSERT ... ON CONFLICT DO NOTHING одним запросом на пачку объектов.
+
+    В отличие от bulk_create(ignore_conflicts=True) возвращает количество
+    действительно вставленных строк, по нему можно понять, существовала
+    ли запись раньше.
+    """
+    objs = list(objs)
+    if not objs:
+        return 0
+    using = router.db_for_write(model)
+    inserted = 0
+    with connections[using].cursor() as cursor:
+        for _, sql, params in insert_statements(model, objs, using):
+            cursor.execute(sql, params)
+            inserted += cursor.rowcount
+    return inserted
+
+
+def insert_ignore_conflicts_returning(model, objs, field_name):
+    """То же, что insert_ignore_conflicts, но возвращает значения поля
+    field_name действительно вставленных строк.
+
+    В PostgreSQL значения возвращает RETURNING. Другие СУБД не сообщают,
+    какие строки пачки пропущены, поэтому объекты вставляются по одному
+    и проверяется rowcount каждого запроса.
+    """
+    objs = list(objs)
+    if not objs:
+        return []
+    using = router.db_for_write(model)
+    connection = connections[using]
+    field = model._meta.get_field(field_name)
+    values = []
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            column = connection.ops.quote_name(field.column)
+            for _, sql, params in insert_statements(model, objs, using):
+                cursor.execute(f'{sql} RETURNING {column}', params)
+                values.extend(row[0] for row in cursor.fetchall())
+        else:
+            for batch, sql, params in insert_statements(
+                    model, objs, using, batch_size=1):
+                cursor.execute(sql, params)
+                if cursor.rowcount:
+                    values.append(getattr(batch[0], field.attname))
+    return values
@@ -1,14 +1,27 @@
-from django.core.exceptions import ValidationError
+from collections import Counter
+
+from rest_framework.exceptions import ValidationError
+
 from recipes.models import Ingredient
 
 
 def ingredients_validator(ingredient_list):
-    testing_list = []
-    for i in ingredient_list:
-        if i['id'] in testing_list:
-            failed_ingr = Ingredient.objects.get(pk=i['id'])
-            raise ValidationError(
-                    'Нельзя добавлять несколько '
-                    f'одинаковых ингредиентов {failed_ingr}'
-                    )
-        testing_list.append(i['id'])
+    """Проверяет ингредиенты рецепта одним запросом к базе.
+
+    Возвращает найденные ингредиенты в виде словаря {id: Ingredient}.
+    """
+    ids = [ingredient['ingredient_id'] for ingredient in ingredient_list]
+    found = Ingredient.objects.in_bulk(set(ids))
+    unknown = sorted(set(ids) - found.keys())
+    if unknown:
+        raise ValidationError(
+            'Ингредиенты с такими id не существуют: '
+            f'{", ".join(map(str, unknown))}'
+        )
+    duplicates = [pk for pk, count in Counter(ids).items() if count > 1]
+    if duplicates:
+        raise ValidationError(
+            'Нельзя добавлять несколько одинаковых ингредиентов: '
+            f'{", ".join(str(found[pk]) for pk in duplicates)}'
+        )
+    return found
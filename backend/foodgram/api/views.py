@@ -1,29 +1,52 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, mixins, status, viewsets
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import (IsAuthenticated,
+                                        IsAuthenticatedOrReadOnly)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
 from api.permissions import IsAuthorOrReadOnlyPermission
 from api.serializers import (CreateRecipeSerializer, FavoriteRecipeSerializer,
                              FollowUserCreateSerializer, FollowUserSerializer,
-                             IngredientSerializer, RecipeSerializer,
+                             IngredientSerializer, RecipeIdsSerializer,
+                             RecipeImageUploadSerializer, RecipeSerializer,
                              ShoppingCartRecipeSerializer, TagSerializer)
+from recipes.catalog import ingredient_catalog
+from recipes.image_uploads import save_upload
 from recipes.models import (Favorite, Follow, Ingredient, Recipe, ShoppingCart,
                             Tag)
-
-from .filters import IngredientFilter, RecipeFilter
-from .mixins import (AllMethodsMixin, CreateDestroyMixin,
+from recipes.relations import relations_changed
+from recipes.shopping_list import change_cart
+from recipes.versions import (INGREDIENTS_VERSION_KEY,
+                              RECIPE_FEED_GENERATION_KEY, RECIPES_VERSION_KEY,
+                              TAGS_VERSION_KEY, get_version,
+                              user_relations_key)
+
+from .filters import IngredientFilter, RecipeFilter, RecipeOrderingFilter
+from .metrics import SHOPPING_LIST_DURATION, exposition, timed_stream
+from .mixins import (AllMethodsMixin, AnonymousResponseCacheMixin,
+                     ConditionalGetMixin, CreateDestroyMixin,
                      ListCreateDestroyMixin, ListRetreiveMixin)
-from .utils import generate_shopping_list
+from .pagination import RecipeCursorPagination
+from .renderers import SHOPPING_LIST_RENDERERS, ShoppingListContentNegotiation
+from .response_cache import normalize_query, recipe_response_cache
+from .utils import (annotate_subscriptions, get_recipes_limit,
+                    get_shopping_list_ingredients, insert_ignore_conflicts,
+                    insert_ignore_conflicts_returning)
 
 User = get_user_model()
 
+COUNTER_ORDERINGS = ('favorites_count', 'in_carts_count')
+
 
-class TagsViewSet(ListRetreiveMixin):
+class TagsViewSet(ConditionalGetMixin, ListRetreiveMixin):
     """Вьюсет для обработки тегов"""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -32,36 +55,142 @@ class TagsViewSet(ListRetreiveMixin):
     lookup_field = 'id'
     pagination_class = None
 
+    def get_conditional_validators(self):
+        version = get_version(TAGS_VERSION_KEY)
+        return f'tags:{version}', version
+
 
-class IngredientsViewSet(ListRetreiveMixin):
+class IngredientsViewSet(ConditionalGetMixin, ListRetreiveMixin):
     """Вьюсет для обработки ингредиентов"""
     queryset = Ingredient.objects.all()
     pagination_class = None
     serializer_class = IngredientSerializer
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
+    filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
-    search_fields = ('name',)
 
+    def get_conditional_validators(self):
+        version = get_version(INGREDIENTS_VERSION_KEY)
+        return f'ingredients:{version}', version
 
-class RecipeViewSet(AllMethodsMixin):
+    def get_search_limit(self):
+        max_limit = settings.INGREDIENTS_SEARCH_MAX_LIMIT
+        try:
+            limit = int(self.request.query_params['limit'])
+        except (KeyError, ValueError):
+            return settings.INGREDIENTS_SEARCH_LIMIT
+        return min(max(limit, 1), max_limit)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and self.request.query_params.get('name'):
+            return queryset[:self.get_search_limit()]
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if not settings.INGREDIENTS_CATALOG_ENABLED:
+            return super().list(request, *args, **kwargs)
+        name = request.query_params.get('name')
+        if name:
+            return Response(ingredient_catalog.search(
+                name, self.get_search_limit()))
+        return Response(ingredient_catalog.all())
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.INGREDIENTS_CATALOG_ENABLED:
+            return super().retrieve(request, *args, **kwargs)
+        try:
+            ingredient = ingredient_catalog.get(int(kwargs['pk']))
+        except ValueError:
+            raise Http404
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
+
+
+class RecipeViewSet(ConditionalGetMixin, AnonymousResponseCacheMixin,
+                    AllMethodsMixin):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
+    filter_backends = (DjangoFilterBackend, filters.SearchFilter,
+                       RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('pub_date', 'favorites_count', 'in_carts_count')
+    ordering = ('-pub_date', '-id')
     permission_classes = [IsAuthorOrReadOnlyPermission,
                           IsAuthenticatedOrReadOnly]
+    response_cache = recipe_response_cache
+
+    @property
+    def paginator(self):
+        """Пагинация по курсору включается параметром pagination=cursor
+        или наличием cursor, иначе используется постраничная"""
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if (params.get('pagination') == 'cursor'
+                    or RecipeCursorPagination.cursor_query_param in params):
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def is_ordered_by_counters(self):
+        ordering = self.request.query_params.get(
+            api_settings.ORDERING_PARAM, '')
+        return any(field in ordering for field in COUNTER_ORDERINGS)
+
+    def is_response_cacheable(self):
+        return not self.is_ordered_by_counters()
+
+    def get_conditional_validators(self):
+        """Валидаторы строятся из версий в кэше, без агрегатов по базе.
+
+        Список сверяется с поколением ленты, которое меняется при любой
+        записи рецептов, тегов и ингредиентов, и с параметрами запроса;
+        рецепт — со своим updated_at. Для авторизованного пользователя
+        учитывается ещё версия его избранного, корзины и подписок.
+        Счётчики избранного и корзин меняются без новой версии, поэтому
+        списки, упорядоченные по ним, не получают ETag и не кэшируются.
+        """
+        user = self.request.user
+        versions = [get_version(TAGS_VERSION_KEY),
+                    get_version(INGREDIENTS_VERSION_KEY)]
+        if user.is_authenticated:
+            versions.append(get_version(user_relations_key(user.pk)))
+        if self.action == 'retrieve':
+            try:
+                updated_at = Recipe.objects.filter(
+                    pk=self.kwargs[self.lookup_field]
+                ).values_list('updated_at', flat=True).first()
+            except ValueError:
+                updated_at = None
+            if updated_at is None:
+                return None, None
+            versions.append(updated_at.timestamp())
+            query = self.kwargs[self.lookup_field]
+        else:
+            if self.is_ordered_by_counters():
+                return None, None
+            versions += [get_version(RECIPES_VERSION_KEY),
+                         get_version(RECIPE_FEED_GENERATION_KEY)]
+            query = normalize_query(self.request.query_params)
+        key = (user.pk, self.action, query, versions)
+        return key, max(versions)
 
     def get_queryset(self):
-        queryset = Recipe.objects.all()
+        user = self.request.user
+        queryset = Recipe.objects.with_related()
         is_favorited = self.request.query_params.get('is_favorited')
         is_in_shopping_cart = (
             self.request.query_params.get('is_in_shopping_cart'))
+        if '1' not in (is_favorited, is_in_shopping_cart):
+            return queryset
+        if user.is_anonymous:
+            return queryset.none()
+        queryset = queryset.with_user_flags(user)
         if is_favorited == '1':
-            queryset = Recipe.objects.filter(
-                starred_by__user=self.request.user)
+            queryset = queryset.filter(is_favorited=True)
         if is_in_shopping_cart == '1':
-            queryset = Recipe.objects.filter(
-                shoppingcart__user=self.request.user)
+            queryset = queryset.filter(is_in_shopping_cart=True)
         return queryset
 
     # Create method
@@ -93,7 +222,7 @@ class RecipeViewSet(AllMethodsMixin):
                                             context={'request': request},
                                             data=request.data,
                                             partial=partial)
-        serializer.is_valid()
+        serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
 
         if getattr(instance, '_prefetched_objects_cache', None):
@@ -112,110 +241,260 @@ class RecipeViewSet(AllMethodsMixin):
 class FollowListViewSet(mixins.ListModelMixin,
                         viewsets.GenericViewSet,):
     lookup_field = 'id'
-    filter_backends = (DjangoFilterBackend,)
+    serializer_class = FollowUserSerializer
+    permission_classes = (IsAuthenticated,)
 
-    def list(self, request):
-        user = request.user
-        user_subscriptions = Follow.objects.filter(user=user)
-        queryset = User.objects.filter(following__in=user_subscriptions)
-        page = self.paginate_queryset(queryset)
-        serializer = FollowUserSerializer(page, many=True,
-                                          context={'request': request})
-        if page is not None:
-            return self.get_paginated_response(serializer.data)
-        return Response(serializer.data)
+    def get_queryset(self):
+        authors = User.objects.filter(
+            following__user=self.request.user
+        ).order_by('pk')
+        return annotate_subscriptions(authors,
+                                      get_recipes_limit(self.request))
 
 
 class FollowCreateDestroyViewSet(CreateDestroyMixin):
     lookup_field = 'id'
 
     def create(self, request, pk):
-        queryset = Follow.objects.all()
         user = request.user
-        author = get_object_or_404(User, pk=pk)
+        author = get_object_or_404(
+            annotate_subscriptions(User.objects.all(),
+                                   get_recipes_limit(request)),
+            pk=pk
+        )
         if user == author:
             return Response('Вы не можете подписаться на самого себя',
                             status=status.HTTP_400_BAD_REQUEST)
-        if not Follow.objects.filter(user=user, author=author):
-            Follow.objects.create(user=user, author=author)
-            queryset = author
-            serializer = FollowUserCreateSerializer(
-                                              queryset,
-                                              context={'request': request,
-                                                       'pk': pk})
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(f'Вы уже подписаны на {author}',
-                        status=status.HTTP_400_BAD_REQUEST)
+        if not insert_ignore_conflicts(
+                Follow, [Follow(user=user, author=author)]):
+            return Response(f'Вы уже подписаны на {author}',
+                            status=status.HTTP_400_BAD_REQUEST)
+        relations_changed(user)
+        serializer = FollowUserCreateSerializer(author,
+                                                context={'request': request,
+                                                         'pk': pk})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, pk):
-        user = request.user
-        author = get_object_or_404(User, pk=pk)
-        if not Follow.objects.filter(user=user, author=author):
+        deleted, _ = Follow.objects.filter(user=request.user,
+                                           author_id=pk).delete()
+        if not deleted:
+            author = get_object_or_404(User, pk=pk)
             return Response(f'Вы не подписаны на {author}',
                             status=status.HTTP_400_BAD_REQUEST)
-        Follow.objects.filter(user=user, author=author).delete()
-        return Response(f'Вы успешно отписаны от {author.username}',
-                        status=status.HTTP_204_NO_CONTENT)
+        relations_changed(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class FavoriteViewSet(CreateDestroyMixin):
     lookup_field = 'id'
 
     def create(self, request, pk):
-        user = request.user
         recipe = get_object_or_404(Recipe, pk=pk)
-        if not Favorite.objects.filter(user=user, recipe=recipe):
-            Favorite.objects.create(user=user, recipe=recipe)
-            queryset = get_object_or_404(Recipe, pk=pk)
-            serializer = FavoriteRecipeSerializer(queryset)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-
-        return Response(f'Вы уже добавили {recipe.name} в избранное',
-                        status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            created = insert_ignore_conflicts(
+                Favorite, [Favorite(user=request.user, recipe=recipe)])
+            if not created:
+                return Response(
+                    f'Вы уже добавили {recipe.name} в избранное',
+                    status=status.HTTP_400_BAD_REQUEST)
+            Recipe.objects.filter(pk=recipe.pk).add_to_counter(
+                'favorites_count', 1)
+            relations_changed(request.user)
+        serializer = FavoriteRecipeSerializer(recipe)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, pk):
-        user = request.user
-        recipe = get_object_or_404(Recipe, pk=pk)
-        if not Favorite.objects.filter(user=user, recipe=recipe):
+        with transaction.atomic():
+            deleted, _ = Favorite.objects.filter(user=request.user,
+                                                 recipe_id=pk).delete()
+            if deleted:
+                Recipe.objects.filter(pk=pk).add_to_counter(
+                    'favorites_count', -deleted)
+                relations_changed(request.user)
+        if not deleted:
+            recipe = get_object_or_404(Recipe, pk=pk)
             return Response(f'Рецепт {recipe.name} не добавлен в избранное',
                             status=status.HTTP_400_BAD_REQUEST)
-        Favorite.objects.filter(user=user, recipe=recipe).delete()
-        return Response(
-            f'Рецепт {recipe.name} успешно удалён из избранного',
-            status=status.HTTP_204_NO_CONTENT)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class CartViewSet(ListCreateDestroyMixin):
+    permission_classes = (IsAuthenticated,)
+
+    def get_renderers(self):
+        if self.action == 'list':
+            return [renderer() for renderer in SHOPPING_LIST_RENDERERS]
+        return super().get_renderers()
+
+    def perform_content_negotiation(self, request, force=False):
+        if self.action == 'list':
+            return ShoppingListContentNegotiation().select_renderer(
+                request, self.get_renderers(), self.format_kwarg)
+        return super().perform_content_negotiation(request, force)
+
+    def handle_exception(self, exc):
+        """Ошибки при скачивании списка отдаются в JSON, а не файлом"""
+        if self.action == 'list':
+            self.request.accepted_renderer = JSONRenderer()
+            self.request.accepted_media_type = JSONRenderer.media_type
+        return super().handle_exception(exc)
+
     def list(self, request, *args, **kwargs):
-        shopping_list = generate_shopping_list(request.user)
-        response = HttpResponse(shopping_list,
-                                status=status.HTTP_200_OK,
-                                content_type='text/plain')
+        renderer = request.accepted_renderer
+        ingredients = get_shopping_list_ingredients(request.user).iterator()
+        response = StreamingHttpResponse(
+            timed_stream(SHOPPING_LIST_DURATION.labels(renderer.format),
+                         renderer.stream(ingredients)),
+            status=status.HTTP_200_OK,
+            content_type=renderer.media_type)
         response['Content-Disposition'] = (
-            'attachment; filename="my_shopping_list.txt"')
+            'attachment; '
+            f'filename="my_shopping_list.{renderer.format}"')
         return response
 
     def create(self, request, **kwargs):
-        user = request.user
-        recipe_id = kwargs['recipe_id']
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
-        if not ShoppingCart.objects.filter(user=user, recipe=recipe):
-            ShoppingCart.objects.create(user=user, recipe=recipe)
-            queryset = get_object_or_404(Recipe, pk=recipe_id)
-            serializer = ShoppingCartRecipeSerializer(queryset)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        return Response(f'Вы уже добавили {recipe.name}'
-                        ' в корзину',
-                        status=status.HTTP_400_BAD_REQUEST)
+        recipe = get_object_or_404(Recipe, pk=kwargs['recipe_id'])
+        with transaction.atomic():
+            created = insert_ignore_conflicts(
+                ShoppingCart,
+                [ShoppingCart(user=request.user, recipe=recipe)])
+            if not created:
+                return Response(f'Вы уже добавили {recipe.name}'
+                                ' в корзину',
+                                status=status.HTTP_400_BAD_REQUEST)
+            Recipe.objects.filter(pk=recipe.pk).add_to_counter(
+                'in_carts_count', 1)
+            change_cart(request.user, [recipe.pk], 1)
+            relations_changed(request.user)
+        serializer = ShoppingCartRecipeSerializer(recipe)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete(self, request, **kwargs):
-        user = request.user
         recipe_id = kwargs['recipe_id']
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
-        if not ShoppingCart.objects.filter(user=user, recipe=recipe):
+        with transaction.atomic():
+            deleted, _ = ShoppingCart.objects.filter(
+                user=request.user, recipe_id=recipe_id).delete()
+            if deleted:
+                Recipe.objects.filter(pk=recipe_id).add_to_counter(
+                    'in_carts_count', -deleted)
+                change_cart(request.user, [recipe_id], -1)
+                relations_changed(request.user)
+        if not deleted:
+            recipe = get_object_or_404(Recipe, pk=recipe_id)
             return Response(f'Рецепт {recipe.name} отсутствует в корзине',
                             status=status.HTTP_400_BAD_REQUEST)
-        ShoppingCart.objects.filter(user=user, recipe=recipe).delete()
-        return Response(f'Рецепт {recipe.name} успешно удалён'
-                        ' из корзины',
-                        status=status.HTTP_204_NO_CONTENT)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RecipeRelationBatchViewSet(viewsets.GenericViewSet):
+    """Пакетное добавление и удаление рецептов в избранном или корзине.
+
+    Рецепты проверяются одним in_bulk, записи вставляются или удаляются
+    одним запросом, в ответе указывается статус каждого id.
+    """
+    serializer_class = RecipeIdsSerializer
+    permission_classes = (IsAuthenticated,)
+    model = None
+    counter_field = None
+
+    def get_recipe_ids(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['recipes']))
+
+    def perform_change(self, user, recipe_ids, sign):
+        """Дополнительные изменения после добавления (sign=1) или
+        удаления (sign=-1) рецептов, например списка покупок"""
+
+    def get_existing(self, user, recipes):
+        """Блокирует найденные записи до конца транзакции: параллельное
+        удаление дождётся её и не найдёт уже удалённые строки"""
+        return set(self.model.objects.select_for_update().filter(
+            user=user, recipe_id__in=recipes
+        ).values_list('recipe_id', flat=True))
+
+    def create(self, request):
+        ids = self.get_recipe_ids(request)
+        recipes = Recipe.objects.only('pk').in_bulk(ids)
+        with transaction.atomic():
+            # Статусы строятся по действительно вставленным строкам:
+            # запись из параллельного запроса попадёт в exists.
+            added = set(insert_ignore_conflicts_returning(
+                self.model,
+                [self.model(user=request.user, recipe_id=pk)
+                 for pk in recipes],
+                'recipe'
+            ))
+            if added:
+                Recipe.objects.filter(pk__in=added).refresh_counter(
+                    self.counter_field, self.model)
+                self.perform_change(request.user, added, 1)
+                relations_changed(request.user)
+        results = [
+            {'id': pk,
+             'status': ('not_found' if pk not in recipes
+                        else 'created' if pk in added else 'exists')}
+            for pk in ids
+        ]
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    def remove(self, request):
+        ids = self.get_recipe_ids(request)
+        recipes = Recipe.objects.only('pk').in_bulk(ids)
+        with transaction.atomic():
+            existing = self.get_existing(request.user, recipes)
+            if existing:
+                self.model.objects.filter(
+                    user=request.user, recipe_id__in=existing).delete()
+                Recipe.objects.filter(pk__in=existing).refresh_counter(
+                    self.counter_field, self.model)
+                self.perform_change(request.user, existing, -1)
+                relations_changed(request.user)
+        results = [
+            {'id': pk,
+             'status': ('not_found' if pk not in recipes
+                        else 'deleted' if pk in existing else 'absent')}
+            for pk in ids
+        ]
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class FavoriteBatchViewSet(RecipeRelationBatchViewSet):
+    model = Favorite
+    counter_field = 'favorites_count'
+
+
+class CartBatchViewSet(RecipeRelationBatchViewSet):
+    model = ShoppingCart
+    counter_field = 'in_carts_count'
+
+    def perform_change(self, user, recipe_ids, sign):
+        change_cart(user, recipe_ids, sign)
+
+
+class RecipeImageUploadViewSet(viewsets.GenericViewSet):
+    """Загрузка изображения рецепта файлом.
+
+    Файл сохраняется как есть, в ответе возвращается image_token для
+    создания или изменения рецепта. Изображение обрабатывается в фоне.
+    """
+    serializer_class = RecipeImageUploadSerializer
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (MultiPartParser,)
+
+    def create(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = save_upload(request.user.pk,
+                            serializer.validated_data['image'])
+        return Response({'image_token': token},
+                        status=status.HTTP_201_CREATED)
+
+
+def metrics(request):
+    """Метрики в текстовом формате Prometheus"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    body, content_type = exposition()
+    return HttpResponse(body, content_type=content_type)
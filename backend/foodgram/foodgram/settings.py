@@ -38,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,6 +89,17 @@ DATABASES = {
     }
 }
 
+# Версии, ответы и связи пользователей должны быть общими для всех
+# процессов gunicorn, поэтому по умолчанию используется memcached.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.memcached.MemcachedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'memcached:11211'),
+    }
+}
+
 
 
 # Password validation
@@ -162,3 +175,56 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=10),
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+INGREDIENTS_SEARCH_LIMIT = 20
+INGREDIENTS_SEARCH_MAX_LIMIT = 100
+INGREDIENTS_CATALOG_ENABLED = True
+
+RECIPES_RESPONSE_CACHE_ALIAS = os.getenv(
+    'RECIPES_RESPONSE_CACHE_ALIAS', 'default')
+RECIPES_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv('RECIPES_RESPONSE_CACHE_TIMEOUT', 60))
+
+USER_RELATIONS_CACHE_TIMEOUT = int(
+    os.getenv('USER_RELATIONS_CACHE_TIMEOUT', 300))
+
+RECIPE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+RECIPE_IMAGE_MAX_SIDE = 2048
+RECIPE_IMAGE_VARIANTS = {
+    'feed': 600,
+    'detail': 1200,
+}
+RECIPE_IMAGE_QUALITY = 85
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
+REQUEST_INSTRUMENTATION_ENABLED = (
+    os.getenv('REQUEST_INSTRUMENTATION_ENABLED', '0') == '1')
+REQUEST_INSTRUMENTATION_SLOW_MS = int(
+    os.getenv('REQUEST_INSTRUMENTATION_SLOW_MS', 500))
+REQUEST_INSTRUMENTATION_DUPLICATES = int(
+    os.getenv('REQUEST_INSTRUMENTATION_DUPLICATES', 10))
+REQUEST_INSTRUMENTATION_SQL_LIMIT = 20
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.middleware': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_INSTRUMENTATION_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
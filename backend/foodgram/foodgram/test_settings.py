@@ -0,0 +1,39 @@
+"""Настройки для тестов.
+
+Без DB_HOST тесты используют SQLite в файле, чтобы параллельные
+запросы из разных потоков работали с одной базой.
+"""
+import os
+import tempfile
+
+from foodgram.settings import *  # noqa: F401,F403
+
+SECRET_KEY = os.getenv('SECRET_KEY', 'test-secret-key')
+
+if not os.getenv('DB_HOST'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(tempfile.gettempdir(), 'foodgram.sqlite3'),
+            # Потоки ждут снятия блокировки записи, а не получают ошибку.
+            'OPTIONS': {'timeout': 20},
+            'TEST': {
+                'NAME': os.path.join(
+                    tempfile.gettempdir(), 'foodgram_test.sqlite3'),
+            },
+        }
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram_media_')
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+# Изображения обрабатываются синхронно: тесты видят результат сразу.
+RECIPE_IMAGE_WORKERS = 0
+# Замеры запросов выключены независимо от окружения: тесты считают
+# запросы к базе и заголовки ответов без них.
+REQUEST_INSTRUMENTATION_ENABLED = False
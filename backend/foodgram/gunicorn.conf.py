@@ -0,0 +1,18 @@
+import os
+import shutil
+
+# Метрики рабочих процессов пишутся в файлы общего каталога
+# и суммируются при выборке /metrics.
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', '/tmp/foodgram_metrics')
+
+
+def on_starting(server):
+    """Метрики прошлого запуска удаляются"""
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -2,6 +2,21 @@ from django.contrib import admin
 
 from recipes.models import (Favorite, Ingredient, IngredientRecipeAmount,
                             Recipe, ShoppingCart, Tag)
+from recipes.shopping_list import change_recipe_ingredients
+
+
+class ReadOnlyAdminMixin:
+    """Только просмотр: записи меняются через API, где обновляются
+    счётчики рецептов и списки покупок"""
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 class TagAdmin(admin.ModelAdmin):
@@ -30,18 +45,25 @@ class IngredientInline(admin.TabularInline):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'starred_count',)
+    list_display = ('name', 'author', 'favorites_count', 'in_carts_count',)
     search_fields = ('name', 'author', 'tags')
     list_filter = ('name',)
     empty_value_display = '-пусто-'
     inlines = (IngredientInline,)
 
-    def starred_count(self, obj):
-        result = Favorite.objects.filter(recipe=obj).count()
-        return result
+    def save_related(self, request, form, formsets, change):
+        """Изменения ингредиентов переносятся в списки покупок, как при
+        изменении рецепта через API"""
+        recipe = form.instance
+        old = dict(recipe.ingredient_amount.values_list(
+            'ingredient_id', 'amount')) if change else {}
+        super().save_related(request, form, formsets, change)
+        new = dict(recipe.ingredient_amount.values_list(
+            'ingredient_id', 'amount'))
+        change_recipe_ingredients(recipe, old, new)
 
 
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
     list_display = (
         'id', 'user', 'recipe',
     )
@@ -50,7 +72,7 @@ class FavoriteAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
     def __init__(self, model, admin_site):
         self.list_display = ([field.name for field in model._meta.fields
                               if field.name != "id"])
@@ -61,7 +83,7 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class IngredientRecipeAmountAdmin(admin.ModelAdmin):
+class IngredientRecipeAmountAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
     list_display = (
         'id', 'recipe', 'amount'
     )
@@ -0,0 +1,242 @@
+import json
+import os
+import shutil
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes.images import recipe_image_files
+from recipes.models import Ingredient, IngredientRecipeAmount, Recipe, Tag
+from recipes.streaming import batched, iter_json_lines
+from recipes.versions import (RECIPE_FEED_GENERATION_KEY, RECIPES_VERSION_KEY,
+                              bump_version)
+
+User = get_user_model()
+
+RECIPES_FILE = 'recipes.ndjson'
+IMAGES_DIR = 'images'
+CHECKPOINT_FILE = 'import_checkpoint.json'
+
+
+def recipe_record(recipe):
+    return {
+        'id': recipe.pk,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'pub_date': recipe.pub_date.isoformat(),
+        'updated_at': recipe.updated_at.isoformat(),
+        'image': recipe.image.name or None,
+        'author': {
+            'username': recipe.author.username,
+            'email': recipe.author.email,
+            'first_name': recipe.author.first_name,
+            'last_name': recipe.author.last_name,
+        },
+        'tags': [
+            {'slug': tag.slug, 'name': tag.name, 'color': tag.color}
+            for tag in recipe.tags.all()
+        ],
+        'ingredients': [
+            {
+                'name': row.ingredient.name,
+                'measurement_unit': row.ingredient.measurement_unit,
+                'amount': row.amount,
+            }
+            for row in recipe.ingredient_amount.all()
+        ],
+    }
+
+
+def iter_recipes(batch_size):
+    """Рецепты пачками по первичному ключу, без OFFSET"""
+    last_pk = 0
+    while True:
+        recipes = list(Recipe.objects.with_related().filter(
+            pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not recipes:
+            return
+        yield from recipes
+        last_pk = recipes[-1].pk
+
+
+def copy_image(name, source_dir):
+    """Копирует изображение из хранилища в архив со всеми копиями"""
+    for file_name in recipe_image_files(name):
+        if not default_storage.exists(file_name):
+            continue
+        target = os.path.join(source_dir, IMAGES_DIR, file_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with default_storage.open(file_name) as source:
+            with open(target, 'wb') as destination:
+                shutil.copyfileobj(source, destination)
+
+
+def export_recipes(path, batch_size=500, with_images=True):
+    """Выгружает рецепты в каталог path, возвращает их количество"""
+    os.makedirs(path, exist_ok=True)
+    exported = 0
+    with open(os.path.join(path, RECIPES_FILE), 'w',
+              encoding='utf-8') as file:
+        for recipe in iter_recipes(batch_size):
+            file.write(json.dumps(recipe_record(recipe),
+                                  ensure_ascii=False))
+            file.write('\n')
+            if with_images and recipe.image:
+                copy_image(recipe.image.name, path)
+            exported += 1
+    return exported
+
+
+class RecipeImporter:
+    """Загружает рецепты из архива пачками.
+
+    Каждая пачка записывается в своей транзакции несколькими
+    bulk_create, после фиксации номер последней строки сохраняется
+    в файл контрольной точки, и прерванную загрузку можно продолжить.
+    """
+
+    def __init__(self, path, batch_size=1000, with_images=True):
+        self.path = path
+        self.batch_size = batch_size
+        self.with_images = with_images
+        self.checkpoint_path = os.path.join(path, CHECKPOINT_FILE)
+
+    def read_checkpoint(self):
+        if not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path, encoding='utf-8') as file:
+            return json.load(file)['line']
+
+    def write_checkpoint(self, line):
+        temporary = self.checkpoint_path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump({'line': line}, file)
+        os.replace(temporary, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def get_authors(self, records):
+        authors = {record['author']['username']: record['author']
+                   for record in records}
+        existing = User.objects.in_bulk(authors, field_name='username')
+        missing = [
+            User(password=make_password(None), **author)
+            for username, author in authors.items()
+            if username not in existing
+        ]
+        if missing:
+            User.objects.bulk_create(missing, ignore_conflicts=True)
+            existing = User.objects.in_bulk(authors, field_name='username')
+        not_created = authors.keys() - existing.keys()
+        if not_created:
+            raise ValueError(
+                f'Не удалось создать авторов: {sorted(not_created)}')
+        return existing
+
+    def get_tags(self, records):
+        tags = {tag['slug']: tag
+                for record in records for tag in record['tags']}
+        existing = Tag.objects.in_bulk(tags, field_name='slug')
+        missing = [Tag(**tag) for slug, tag in tags.items()
+                   if slug not in existing]
+        if missing:
+            Tag.objects.bulk_create(missing, ignore_conflicts=True)
+            existing = Tag.objects.in_bulk(tags, field_name='slug')
+        not_created = tags.keys() - existing.keys()
+        if not_created:
+            raise ValueError(f'Не удалось создать теги: {sorted(not_created)}')
+        return existing
+
+    def get_ingredients(self, records):
+        keys = {
+            (ingredient['name'], ingredient['measurement_unit'])
+            for record in records for ingredient in record['ingredients']
+        }
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=name, measurement_unit=unit)
+             for name, unit in keys),
+            ignore_conflicts=True
+        )
+        names = {name for name, _ in keys}
+        return {
+            (ingredient.name, ingredient.measurement_unit): ingredient.pk
+            for ingredient in Ingredient.objects.filter(name__in=names)
+        }
+
+    def restore_image(self, name):
+        for file_name in recipe_image_files(name):
+            source = os.path.join(self.path, IMAGES_DIR, file_name)
+            if (not os.path.exists(source)
+                    or default_storage.exists(file_name)):
+                continue
+            with open(source, 'rb') as file:
+                default_storage.save(file_name, File(file))
+
+    @transaction.atomic
+    def import_batch(self, records):
+        authors = self.get_authors(records)
+        tags = self.get_tags(records)
+        ingredients = self.get_ingredients(records)
+        recipes = [
+            Recipe(
+                author=authors[record['author']['username']],
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+                pub_date=parse_datetime(record['pub_date']),
+                updated_at=parse_datetime(record['updated_at']),
+            )
+            for record in records
+        ]
+        Recipe.objects.bulk_create_with_dates(recipes)
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe_id=recipe.pk,
+                                tag_id=tags[tag['slug']].pk)
+            for recipe, record in zip(recipes, records)
+            for tag in record['tags']
+        )
+        IngredientRecipeAmount.objects.bulk_create(
+            IngredientRecipeAmount(
+                recipe_id=recipe.pk,
+                ingredient_id=ingredients[
+                    ingredient['name'], ingredient['measurement_unit']],
+                amount=ingredient['amount'])
+            for recipe, record in zip(recipes, records)
+            for ingredient in record['ingredients']
+        )
+        if self.with_images:
+            for record in records:
+                if record['image']:
+                    self.restore_image(record['image'])
+
+    def run(self, restart=False, progress=None):
+        """Возвращает количество загруженных за этот запуск рецептов"""
+        if restart:
+            self.clear_checkpoint()
+        done = self.read_checkpoint()
+        imported = 0
+        with open(os.path.join(self.path, RECIPES_FILE),
+                  encoding='utf-8') as file:
+            records = iter_json_lines(file)
+            for _ in range(done):
+                next(records)
+            for batch in batched(records, self.batch_size):
+                self.import_batch(batch)
+                done += len(batch)
+                imported += len(batch)
+                self.write_checkpoint(done)
+                if progress is not None:
+                    progress(done)
+        self.clear_checkpoint()
+        if imported:
+            bump_version(RECIPES_VERSION_KEY)
+            bump_version(RECIPE_FEED_GENERATION_KEY)
+        return imported
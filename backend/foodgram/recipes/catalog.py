@@ -0,0 +1,88 @@
+import threading
+from bisect import bisect_left
+from collections import namedtuple
+from types import MappingProxyType
+
+from recipes.metrics import record_cache_access
+from recipes.models import Ingredient
+from recipes.versions import INGREDIENTS_VERSION_KEY, get_version
+
+CatalogSnapshot = namedtuple(
+    'CatalogSnapshot', ('version', 'items', 'by_id', 'names', 'sorted_items'))
+EMPTY_SNAPSHOT = CatalogSnapshot(None, (), MappingProxyType({}), (), ())
+
+
+def load_snapshot(version):
+    items = tuple(
+        {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+        for pk, name, measurement_unit in Ingredient.objects.order_by(
+            'pk').values_list('pk', 'name', 'measurement_unit')
+    )
+    sorted_items = tuple(sorted(
+        items, key=lambda item: (item['name'].lower(), item['name'])))
+    return CatalogSnapshot(
+        version=version,
+        items=items,
+        by_id=MappingProxyType({item['id']: item for item in items}),
+        names=tuple(item['name'].lower() for item in sorted_items),
+        sorted_items=sorted_items,
+    )
+
+
+class IngredientCatalog:
+    """Справочник ингредиентов в памяти процесса.
+
+    Названия хранятся отсортированными в нижнем регистре, поиск по началу
+    названия выполняется бинарным поиском. Перед каждым обращением
+    сверяется версия в кэше, база данных читается только при её смене.
+
+    Данные справочника собраны в неизменяемый снимок, который заменяется
+    одним присваиванием; каждое обращение работает с одним снимком, даже
+    если другой поток в это время загружает новый.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = EMPTY_SNAPSHOT
+
+    def snapshot(self):
+        version = get_version(INGREDIENTS_VERSION_KEY)
+        snapshot = self._snapshot
+        record_cache_access('ingredient_catalog', version == snapshot.version)
+        if version == snapshot.version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if version != snapshot.version:
+                snapshot = load_snapshot(version)
+                self._snapshot = snapshot
+        return snapshot
+
+    def all(self):
+        return self.snapshot().items
+
+    def get(self, pk):
+        return self.snapshot().by_id.get(pk)
+
+    def search(self, value, limit):
+        """Сначала совпадения с начала названия, затем вхождения"""
+        snapshot = self.snapshot()
+        names, sorted_items = snapshot.names, snapshot.sorted_items
+        value = value.lower()
+        result = []
+        index = bisect_left(names, value)
+        while (index < len(names) and names[index].startswith(value)
+               and len(result) < limit):
+            result.append(sorted_items[index])
+            index += 1
+        if len(result) == limit:
+            return result
+        for index, name in enumerate(names):
+            if value in name and not name.startswith(value):
+                result.append(sorted_items[index])
+                if len(result) == limit:
+                    break
+        return result
+
+
+ingredient_catalog = IngredientCatalog()
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии данных и связи пользователей хранятся в кэше по умолчанию.
+    В кэше отдельного процесса версии расходятся между процессами
+    gunicorn, и ответы с ETag становятся неверными."""
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    level = Warning if settings.DEBUG else Error
+    return [level(
+        f'Кэш по умолчанию {backend} не общий для процессов.',
+        hint='Укажите CACHE_BACKEND и CACHE_LOCATION общего кэша, '
+             'например memcached.',
+        id='recipes.E001' if level is Error else 'recipes.W001',
+    )]
@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models import Max, Min
+
+from recipes.models import Favorite, ShoppingCart
+
+COUNTERS = (
+    ('favorites_count', Favorite),
+    ('in_carts_count', ShoppingCart),
+)
+
+
+def recount_recipe_counters(recipe_model, batch_size=1000):
+    """Пересчитывает счётчики избранного и корзин диапазонами по
+    batch_size id рецептов и возвращает количество обновлённых рецептов.
+
+    Каждый счётчик обновляется одним UPDATE с подзапросом, без чтения
+    значений в Python, поэтому изменения add_to_counter, сделанные во
+    время пересчёта, не перезаписываются.
+    """
+    bounds = recipe_model.objects.aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return 0
+    updated = 0
+    for start in range(bounds['first'] - 1, bounds['last'], batch_size):
+        recipes = recipe_model.objects.filter(
+            pk__gt=start, pk__lte=start + batch_size)
+        with transaction.atomic():
+            for field, related_model in COUNTERS:
+                count = recipes.refresh_counter(field, related_model)
+        updated += count
+    return updated
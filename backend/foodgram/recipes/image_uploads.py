@@ -0,0 +1,122 @@
+import base64
+import binascii
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from recipes.images import delete_recipe_image, store_recipe_image
+from recipes.models import IMAGE_FAILED, IMAGE_READY, Recipe
+from recipes.versions import RECIPE_FEED_GENERATION_KEY, bump_version
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = 'media/uploads'
+BASE64_SUFFIX = '.b64'
+
+
+def upload_name(user_id, token):
+    return f'{UPLOADS_DIR}/{user_id}/{token}'
+
+
+def save_upload(user_id, content):
+    """Сохраняет загруженный файл как есть и возвращает токен"""
+    token = uuid.uuid4().hex
+    default_storage.save(upload_name(user_id, token), content)
+    return token
+
+
+def save_base64_upload(user_id, data):
+    """Сохраняет строку base64 без декодирования, возвращает имя файла"""
+    name = upload_name(user_id, uuid.uuid4().hex) + BASE64_SUFFIX
+    return default_storage.save(name, ContentFile(data.encode()))
+
+
+def find_upload(user_id, token):
+    if not token.isalnum():
+        return None
+    name = upload_name(user_id, token)
+    return name if default_storage.exists(name) else None
+
+
+def read_upload(name):
+    with default_storage.open(name) as upload:
+        data = upload.read()
+    if name.endswith(BASE64_SUFFIX):
+        _, _, data = data.partition(b';base64,')
+        data = base64.b64decode(data, validate=True)
+    return ContentFile(data)
+
+
+def process_pending_image(recipe_id):
+    """Обрабатывает ожидающее изображение рецепта.
+
+    Рецепт обновляется, только если за время обработки не было
+    загружено новое изображение.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'pk', 'image', 'pending_image').first()
+    if recipe is None or not recipe.pending_image:
+        return
+    upload = recipe.pending_image
+    old_image = recipe.image.name
+    changes = {'pending_image': '', 'updated_at': timezone.now()}
+    try:
+        changes['image'] = store_recipe_image(read_upload(upload))
+        changes['image_status'] = IMAGE_READY
+    except (OSError, ValueError, binascii.Error,
+            Image.DecompressionBombError):
+        logger.warning('Не удалось обработать изображение %s', upload)
+        changes['image_status'] = IMAGE_FAILED
+    updated = Recipe.objects.filter(
+        pk=recipe_id, pending_image=upload).update(**changes)
+    if updated:
+        bump_version(RECIPE_FEED_GENERATION_KEY)
+        if changes.get('image', old_image) != old_image:
+            delete_recipe_image(old_image)
+    default_storage.delete(upload)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-images')
+    return _executor
+
+
+def run_image_job(recipe_id):
+    try:
+        process_pending_image(recipe_id)
+    except Exception:
+        logger.exception('Ошибка обработки изображения рецепта %s',
+                         recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_pending_image(recipe_id):
+    """Ставит обработку изображения в очередь после фиксации транзакции.
+
+    При RECIPE_IMAGE_WORKERS = 0 изображение обрабатывается сразу,
+    в том же потоке. Задачи, потерянные при перезапуске, выполняет
+    команда process_pending_images.
+    """
+    if not settings.RECIPE_IMAGE_WORKERS:
+        transaction.on_commit(lambda: process_pending_image(recipe_id))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(run_image_job, recipe_id))
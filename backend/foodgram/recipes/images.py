@@ -0,0 +1,130 @@
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from recipes.models import Recipe
+
+# MEDIA_ROOT в контейнере — /app/, общий с nginx том подключён только
+# к /app/media/, поэтому файлы сохраняются внутри media/.
+IMAGES_DIR = 'media/recipes'
+IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+
+def image_base_name(digest):
+    return f'{IMAGES_DIR}/{digest[:2]}/{digest}'
+
+
+def variant_name(name, variant, extension):
+    base, _ = os.path.splitext(name)
+    return f'{base}_{variant}.{extension}'
+
+
+def is_processed(name):
+    """Изображения, сохранённые до появления обработки, лежат прямо
+    в media/ и не имеют уменьшенных копий"""
+    return bool(name) and name.startswith(IMAGES_DIR + '/')
+
+
+def encode(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        image.convert('RGB').save(
+            buffer, 'JPEG', quality=settings.RECIPE_IMAGE_QUALITY,
+            optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        image.save(buffer, 'WEBP', quality=settings.RECIPE_IMAGE_QUALITY)
+    else:
+        image.save(buffer, image_format, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def save_file(name, content):
+    # Хранилище не перезаписывает файлы, а меняет имя; копии,
+    # оставшиеся от прерванной обработки, удаляются.
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, content)
+
+
+def resized(image, max_side):
+    if max(image.size) <= max_side:
+        return image
+    image = image.copy()
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+
+def store_recipe_image(content):
+    """Сохраняет загруженное изображение рецепта и его копии.
+
+    Имя файла — хэш содержимого, поэтому одинаковые загрузки хранятся
+    один раз и повторно не обрабатываются. Изображение декодируется
+    один раз, ограничивается RECIPE_IMAGE_MAX_SIDE и уменьшается
+    до размеров RECIPE_IMAGE_VARIANTS в исходном формате и в WebP.
+    Возвращает имя основного файла в хранилище.
+    """
+    content.seek(0)
+    data = content.read()
+    digest = hashlib.sha256(data).hexdigest()
+    image = Image.open(io.BytesIO(data), formats=IMAGE_FORMATS)
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA', 'P')
+    image_format, extension = ('PNG', 'png') if has_alpha else ('JPEG', 'jpg')
+    name = f'{image_base_name(digest)}.{extension}'
+    if default_storage.exists(name):
+        return name
+    image = resized(image, settings.RECIPE_IMAGE_MAX_SIDE)
+    for variant, max_side in settings.RECIPE_IMAGE_VARIANTS.items():
+        thumbnail = resized(image, max_side)
+        save_file(variant_name(name, variant, extension),
+                  encode(thumbnail, image_format))
+        save_file(variant_name(name, variant, 'webp'),
+                  encode(thumbnail, 'WEBP'))
+    # Основной файл пишется последним: по нему проверяется,
+    # что изображение уже обработано.
+    return save_file(name, encode(image, image_format))
+
+
+def recipe_image_files(name):
+    if not is_processed(name):
+        return [name] if name else []
+    _, extension = os.path.splitext(name)
+    files = [name]
+    for variant in settings.RECIPE_IMAGE_VARIANTS:
+        files.append(variant_name(name, variant, extension.lstrip('.')))
+        files.append(variant_name(name, variant, 'webp'))
+    return files
+
+
+def recipe_image_variants(name):
+    """Ссылки на копии изображения; для необработанных изображений
+    все ссылки ведут на оригинал"""
+    if not name:
+        return None
+    if not is_processed(name):
+        url = default_storage.url(name)
+        return {variant: {'original': url, 'webp': url}
+                for variant in settings.RECIPE_IMAGE_VARIANTS}
+    _, extension = os.path.splitext(name)
+    return {
+        variant: {
+            'original': default_storage.url(
+                variant_name(name, variant, extension.lstrip('.'))),
+            'webp': default_storage.url(variant_name(name, variant, 'webp')),
+        }
+        for variant in settings.RECIPE_IMAGE_VARIANTS
+    }
+
+
+def delete_recipe_image(name):
+    """Удаляет файлы изображения, если на него не ссылается
+    ни один рецепт"""
+    if not name or Recipe.objects.filter(image=name).exists():
+        return
+    for file_name in recipe_image_files(name):
+        default_storage.delete(file_name)
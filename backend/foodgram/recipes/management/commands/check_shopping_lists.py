@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from recipes.shopping_list import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'Rebuild shopping lists from carts and report mismatches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report mismatches without rebuilding')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Users rebuilt in one transaction')
+
+    def handle(self, *args, **options):
+        mismatches = rebuild_shopping_lists(
+            fix=not options['dry_run'], batch_size=options['batch_size'])
+        for user_id, ingredient_id, stored, actual in mismatches:
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'{stored} != {actual}'
+            )
+        self.stdout.write(f'Расхождений: {len(mismatches)}')
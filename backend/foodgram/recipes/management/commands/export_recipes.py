@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.archive import export_recipes
+
+
+class Command(BaseCommand):
+    help = 'Export recipes with images to a newline-delimited JSON archive'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archive directory')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--no-images', action='store_true')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        exported = export_recipes(
+            options['path'], options['batch_size'],
+            with_images=not options['no_images'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Выгружено рецептов: {exported} за {elapsed:.1f} с')
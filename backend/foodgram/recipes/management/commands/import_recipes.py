@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.archive import RecipeImporter
+
+
+class Command(BaseCommand):
+    help = 'Import recipes from an archive made by export_recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archive directory')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--no-images', action='store_true')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore the checkpoint and import from the beginning')
+
+    def handle(self, *args, **options):
+        importer = RecipeImporter(
+            options['path'], options['batch_size'],
+            with_images=not options['no_images'])
+        started = time.monotonic()
+
+        def progress(done):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Загружено строк: {done}')
+
+        try:
+            imported = importer.run(options['restart'], progress)
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(
+                f'Загрузка остановлена, её можно продолжить '
+                f'повторным запуском: {error!r}')
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Загружено рецептов: {imported} за {elapsed:.1f} с '
+            f'({imported / max(elapsed, 1e-6):.0f} рецептов/с)'
+        )
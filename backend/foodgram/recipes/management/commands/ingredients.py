@@ -1,26 +1,66 @@
-import json
+import os
+import time
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 from recipes.models import Ingredient
+from recipes.streaming import batched, iter_csv_rows, iter_json_array
+from recipes.versions import INGREDIENTS_VERSION_KEY, bump_version
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(__file__), 'data', 'ingredients.json')
+FIELDS = ('name', 'measurement_unit')
 
 
 class Command(BaseCommand):
-    help = 'Fill database with ingredients'
-
-    def handle(self, *args, **kwargs):
-        file = open('recipes/management/commands/data/ingredients.json',
-                    encoding='utf-8')
-        data = json.loads(file.read())
-        ingredient_objs = []
-        for ingredient in data:
-            name = ingredient['name']
-            measurement_unit = ingredient['measurement_unit']
-            ingredient_objs.append(
-                Ingredient(
-                    name=name,
-                    measurement_unit=measurement_unit,)
-                )
-        Ingredient.objects.bulk_create(
-            ingredient_objs, ignore_conflicts=True
+    help = 'Import ingredients from a JSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=DEFAULT_PATH)
+        parser.add_argument(
+            '--format', choices=('json', 'csv'),
+            help='File format, detected by extension by default')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def read_rows(self, file, file_format):
+        if file_format == 'csv':
+            return iter_csv_rows(file, FIELDS)
+        return iter_json_array(file)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path)[1].lstrip('.').lower()
+        if file_format not in ('json', 'csv'):
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        started = time.monotonic()
+        processed = 0
+        before = Ingredient.objects.count()
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                rows = self.read_rows(file, file_format)
+                for batch in batched(rows, options['batch_size']):
+                    # Повторы внутри файла и уже загруженные ингредиенты
+                    # отбрасывает ограничение уникальности.
+                    Ingredient.objects.bulk_create(
+                        (Ingredient(
+                            name=row['name'].strip(),
+                            measurement_unit=row['measurement_unit'].strip())
+                         for row in batch),
+                        ignore_conflicts=True
+                    )
+                    processed += len(batch)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'Обработано строк: {processed}')
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Ошибка чтения {path}: {error!r}')
+        finally:
+            if processed:
+                bump_version(INGREDIENTS_VERSION_KEY)
+        elapsed = time.monotonic() - started
+        created = Ingredient.objects.count() - before
+        self.stdout.write(
+            f'Обработано строк: {processed}, добавлено: {created} '
+            f'за {elapsed:.1f} с ({processed / max(elapsed, 1e-6):.0f} '
+            f'строк/с)'
         )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.image_uploads import process_pending_image
+from recipes.models import IMAGE_PENDING, Recipe
+
+
+class Command(BaseCommand):
+    help = 'Process recipe images left pending'
+
+    def handle(self, *args, **options):
+        recipe_ids = list(Recipe.objects.filter(
+            image_status=IMAGE_PENDING).values_list('pk', flat=True))
+        for recipe_id in recipe_ids:
+            process_pending_image(recipe_id)
+        self.stdout.write(f'Обработано изображений: {len(recipe_ids)}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount_recipe_counters
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Recount favorites and shopping cart counters of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = recount_recipe_counters(Recipe, options['batch_size'])
+        self.stdout.write(f'Пересчитано рецептов: {updated}')
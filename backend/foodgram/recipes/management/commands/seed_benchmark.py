@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.seeding import BenchmarkSeeder
+
+
+class Command(BaseCommand):
+    help = ('Generate users, follows, recipes, tags, ingredient lines, '
+            'favorites and carts for benchmarks')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument(
+            '--ingredients', type=int, default=2000,
+            help='Minimal size of the ingredient catalog')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--follows-per-user', type=int, default=20)
+        parser.add_argument('--favorites-per-user', type=int, default=30)
+        parser.add_argument('--carts-per-user', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--prefix', default='bench',
+            help='Prefix of generated usernames and tag slugs')
+        parser.add_argument(
+            '--flush', action='store_true',
+            help='Delete data generated earlier with the same prefix')
+
+    def handle(self, *args, **options):
+        seeder = BenchmarkSeeder(
+            options['prefix'], options['seed'], options['batch_size'])
+        if options['flush']:
+            deleted = seeder.flush()
+            self.stdout.write(f'Удалено объектов: {deleted}')
+        started = time.monotonic()
+        created = seeder.run(
+            users=options['users'],
+            recipes=options['recipes'],
+            tags=options['tags'],
+            ingredients=options['ingredients'],
+            ingredients_per_recipe=options['ingredients_per_recipe'],
+            follows_per_user=options['follows_per_user'],
+            favorites_per_user=options['favorites_per_user'],
+            carts_per_user=options['carts_per_user'],
+        )
+        elapsed = time.monotonic() - started
+        for name, count in created.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(f'Данные созданы за {elapsed:.1f} с')
@@ -0,0 +1,12 @@
+from prometheus_client import Counter
+
+CACHE_REQUESTS = Counter(
+    'foodgram_cache_requests_total',
+    'Обращения к кэшам приложения',
+    ['cache', 'result'],
+)
+
+
+def record_cache_access(cache, hit):
+    """Доля попаданий считается при выборке как hit / (hit + miss)"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
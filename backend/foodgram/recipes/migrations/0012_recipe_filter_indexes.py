@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+TRIGRAM_INDEX_NAME = 'recipe_name_trgm_idx'
+
+
+def create_trigram_index(apps, schema_editor):
+    # Поиск по названию рецепта ускоряется триграммным индексом
+    # только в PostgreSQL.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX_NAME} '
+        'ON recipes_recipe USING gin (UPPER(name::text) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        # Автоматическая промежуточная таблица тегов не поддерживает
+        # Meta.indexes, поэтому индекс для выборки рецептов по тегу
+        # создаётся SQL-запросом.
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX IF EXISTS recipe_tags_tag_recipe_idx',
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
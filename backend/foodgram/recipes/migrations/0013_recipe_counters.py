@@ -0,0 +1,45 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_relations(apps, field, model_name):
+    # Копия пересчёта счётчиков на момент миграции, не зависящая от
+    # дальнейших изменений кода приложения.
+    Recipe = apps.get_model('recipes', 'Recipe')
+    related_model = apps.get_model('recipes', model_name)
+    totals = related_model.objects.filter(
+        recipe=OuterRef('pk')
+    ).values('recipe').annotate(total=Count('pk')).values('total')
+    Recipe.objects.update(**{field: Coalesce(
+        Subquery(totals, output_field=models.IntegerField()), 0)})
+
+
+def fill_counters(apps, schema_editor):
+    count_relations(apps, 'favorites_count', 'Favorite')
+    count_relations(apps, 'in_carts_count', 'ShoppingCart')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Количество пользователей, добавивших рецепт в избранное', verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Количество пользователей, добавивших рецепт в корзину', verbose_name='В корзинах'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_relations(apps, field, model_name):
+    # Копия пересчёта счётчиков на момент миграции, не зависящая от
+    # дальнейших изменений кода приложения.
+    Recipe = apps.get_model('recipes', 'Recipe')
+    related_model = apps.get_model('recipes', model_name)
+    totals = related_model.objects.filter(
+        recipe=OuterRef('pk')
+    ).values('recipe').annotate(total=Count('pk')).values('total')
+    Recipe.objects.update(**{field: Coalesce(
+        Subquery(totals, output_field=models.IntegerField()), 0)})
+
+
+def remove_duplicates(apps, schema_editor):
+    # Ограничение уникальности корзины не было создано в базе,
+    # поэтому перед его добавлением удаляются повторные записи.
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    keep = ShoppingCart.objects.values('user', 'recipe').annotate(
+        keep_id=Min('id')).values('keep_id')
+    ShoppingCart.objects.exclude(id__in=keep).delete()
+    count_relations(apps, 'in_carts_count', 'ShoppingCart')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shoppingcart'),
+        ),
+    ]
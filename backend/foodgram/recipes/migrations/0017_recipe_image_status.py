@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('ready', 'Готово'), ('pending', 'Обрабатывается'), ('failed', 'Ошибка')], default='ready', editable=False, max_length=16, verbose_name='Обработка изображения'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='pending_image',
+            field=models.CharField(blank=True, editable=False, help_text='Файл, ожидающий обработки', max_length=255, verbose_name='Загруженное изображение'),
+        ),
+    ]
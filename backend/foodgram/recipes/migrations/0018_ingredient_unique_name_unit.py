@@ -0,0 +1,50 @@
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    # Повторный запуск загрузки ингредиентов создавал дубликаты.
+    # Ссылки на них переносятся на первую запись; если рецепт или список
+    # покупок уже ссылается на неё, количества складываются.
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipeAmount = apps.get_model(
+        'recipes', 'IngredientRecipeAmount')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    groups = Ingredient.objects.values('name', 'measurement_unit').annotate(
+        keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for group in groups.iterator():
+        duplicate_ids = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep_id']).values_list('id', flat=True))
+        for duplicate_id in duplicate_ids:
+            for model, owner in ((IngredientRecipeAmount, 'recipe_id'),
+                                 (ShoppingListItem, 'user_id')):
+                kept = model.objects.filter(ingredient_id=group['keep_id'])
+                for row in model.objects.filter(
+                        ingredient_id=duplicate_id,
+                        **{f'{owner}__in': kept.values(owner)}):
+                    kept.filter(**{owner: getattr(row, owner)}).update(
+                        amount=F('amount') + row.amount)
+                    row.delete()
+                model.objects.filter(ingredient_id=duplicate_id).update(
+                    ingredient_id=group['keep_id'])
+        Ingredient.objects.filter(id__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_name_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_name_unit'),
+        ),
+    ]
@@ -1,7 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery
 from django.db.models.constraints import UniqueConstraint
+from django.db.models.functions import Coalesce, Greatest
 
 User = get_user_model()
 
@@ -40,10 +42,101 @@ class Ingredient(models.Model):
         help_text='Единица измерения ингредиента'
     )
 
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_name_unit'
+                )
+        ]
+
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """Добавляет is_favorited и is_in_shopping_cart подзапросами EXISTS
+        для фильтрации по избранному и корзине"""
+        if user.is_anonymous:
+            return self
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
+
+    def limit_per_author(self, limit):
+        """Оставляет не больше limit последних рецептов каждого автора;
+        ограничение выполняется коррелированным подзапросом в SQL"""
+        latest = self.model.objects.filter(
+            author=OuterRef('author')
+        ).order_by('-pub_date', '-pk').values('pk')[:limit]
+        return self.filter(pk__in=Subquery(latest))
+
+    def add_to_counter(self, field, delta):
+        """Атомарно меняет денормализованный счётчик через F().
+
+        Значение не опускается ниже нуля: связь могла быть создана в
+        обход счётчика, и уменьшение нарушило бы ограничение
+        PositiveIntegerField.
+        """
+        return self.update(**{field: Greatest(models.F(field) + delta, 0)})
+
+    def refresh_counter(self, field, related_model):
+        """Пересчитывает счётчик по связанной модели одним UPDATE
+        с подзапросом"""
+        totals = related_model.objects.filter(
+            recipe=OuterRef('pk')
+        ).values('recipe').annotate(total=Count('pk')).values('total')
+        return self.update(**{field: Coalesce(
+            Subquery(totals, output_field=models.IntegerField()), 0)})
+
+    def bulk_create_with_dates(self, objs):
+        """bulk_create с сохранением pub_date и updated_at объектов.
+
+        Эти поля заполняются автоматически при создании, поэтому
+        переданные значения восстанавливаются отдельным обновлением.
+        Если СУБД не возвращает id из пакетной вставки, рецепты
+        сохраняются по одному.
+        """
+        dates = [(recipe.pub_date, recipe.updated_at) for recipe in objs]
+        if connections[self.db].features.can_return_ids_from_bulk_insert:
+            self.bulk_create(objs)
+        else:
+            for recipe in objs:
+                recipe.save(using=self.db)
+        for recipe, (pub_date, updated_at) in zip(objs, dates):
+            recipe.pub_date = pub_date
+            recipe.updated_at = updated_at
+        self.bulk_update(objs, ['pub_date', 'updated_at'])
+        return objs
+
+    def with_related(self):
+        """План чтения рецепта: автор, теги и ингредиенты загружаются
+        фиксированным числом запросов независимо от размера страницы"""
+        return self.select_related('author').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'ingredient_amount',
+                queryset=IngredientRecipeAmount.objects.select_related(
+                    'ingredient')
+            ),
+        )
+
+
+IMAGE_READY = 'ready'
+IMAGE_PENDING = 'pending'
+IMAGE_FAILED = 'failed'
+IMAGE_STATUSES = (
+    (IMAGE_READY, 'Готово'),
+    (IMAGE_PENDING, 'Обрабатывается'),
+    (IMAGE_FAILED, 'Ошибка'),
+)
+
+
 class Recipe(models.Model):
     name = models.CharField(
         max_length=200,
@@ -52,6 +145,7 @@ class Recipe(models.Model):
     )
     text = models.TextField()
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -65,6 +159,20 @@ class Recipe(models.Model):
         verbose_name='Изображение',
         max_length=2048
         )
+    image_status = models.CharField(
+        max_length=16,
+        choices=IMAGE_STATUSES,
+        default=IMAGE_READY,
+        editable=False,
+        verbose_name='Обработка изображения',
+    )
+    pending_image = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='Загруженное изображение',
+        help_text='Файл, ожидающий обработки'
+    )
 
     tags = models.ManyToManyField(
         Tag,
@@ -82,6 +190,30 @@ class Recipe(models.Model):
         through='IngredientRecipeAmount',
         verbose_name='Ингредиент',
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном',
+        help_text='Количество пользователей, добавивших рецепт в избранное'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В корзинах',
+        help_text='Количество пользователей, добавивших рецепт в корзину'
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=['-favorites_count', '-id'],
+                         name='recipe_favorites_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -177,3 +309,34 @@ class IngredientRecipeAmount(models.Model):
                 name='unique_ingredient_recipe'
                 )
         ]
+
+
+class ShoppingListItem(models.Model):
+    """Список покупок пользователя, агрегированный по ингредиентам.
+
+    Обновляется при изменении корзины и ингредиентов рецептов в ней,
+    чтобы скачивание списка было одним чтением по индексу.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+                )
+        ]
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import CharField, Value
+
+from recipes.metrics import record_cache_access
+from recipes.models import Favorite, Follow, ShoppingCart
+from recipes.versions import bump_version, get_version, user_relations_key
+
+RELATIONS = {
+    'favorites': (Favorite, 'recipe_id'),
+    'cart': (ShoppingCart, 'recipe_id'),
+    'following': (Follow, 'author_id'),
+}
+
+
+class UserRelations:
+    """Избранное, корзина и подписки пользователя в виде множеств id"""
+
+    def __init__(self, favorites=(), cart=(), following=()):
+        self.favorites = frozenset(favorites)
+        self.cart = frozenset(cart)
+        self.following = frozenset(following)
+
+
+def relations_cache_key(user_id, version):
+    return f'user_relations_{user_id}_{version}'
+
+
+def load_relations(user_id):
+    """Все три множества одним запросом UNION ALL"""
+    querysets = [
+        model.objects.filter(user_id=user_id).annotate(
+            kind=Value(kind, output_field=CharField())
+        ).values_list('kind', field)
+        for kind, (model, field) in RELATIONS.items()
+    ]
+    relations = {kind: set() for kind in RELATIONS}
+    for kind, pk in querysets[0].union(*querysets[1:], all=True):
+        relations[kind].add(pk)
+    return relations
+
+
+def get_user_relations(user):
+    """Множества берутся из общего кэша, при промахе загружаются
+    одним запросом.
+
+    В ключ входит версия связей пользователя: после изменения читается
+    новый ключ, а копия, собранная параллельным запросом до фиксации
+    изменения, остаётся под старым и больше не используется.
+    """
+    if user.is_anonymous:
+        return UserRelations()
+    version = get_version(user_relations_key(user.pk))
+    key = relations_cache_key(user.pk, version)
+    relations = cache.get(key)
+    record_cache_access('user_relations', relations is not None)
+    if relations is None:
+        relations = load_relations(user.pk)
+        cache.set(key, relations, settings.USER_RELATIONS_CACHE_TIMEOUT)
+    return UserRelations(**relations)
+
+
+def get_request_relations(request):
+    """Множества загружаются один раз на запрос"""
+    if not hasattr(request, '_user_relations'):
+        request._user_relations = get_user_relations(request.user)
+    return request._user_relations
+
+
+def relations_changed(user):
+    """Новая версия связей выставляется после фиксации изменения;
+    по ней же меняется ETag ответов пользователя"""
+    bump_version(user_relations_key(user.pk))
@@ -0,0 +1,189 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.counters import recount_recipe_counters
+from recipes.models import (Favorite, Follow, Ingredient,
+                            IngredientRecipeAmount, Recipe, ShoppingCart, Tag)
+from recipes.shopping_list import rebuild_shopping_lists
+from recipes.streaming import batched
+from recipes.versions import (INGREDIENTS_VERSION_KEY,
+                              RECIPE_FEED_GENERATION_KEY, RECIPES_VERSION_KEY,
+                              TAGS_VERSION_KEY, bump_version,
+                              user_relations_key)
+
+User = get_user_model()
+
+DISHES = ('суп', 'салат', 'пирог', 'рагу', 'омлет', 'каша', 'запеканка',
+          'паста', 'плов', 'котлеты', 'блины', 'смузи')
+ADJECTIVES = ('домашний', 'быстрый', 'летний', 'острый', 'сливочный',
+              'овощной', 'праздничный', 'лёгкий', 'сытный', 'бабушкин')
+PUBLISHED_DAYS = 365
+
+
+class BenchmarkSeeder:
+    """Наполняет базу данными для замеров производительности.
+
+    Все объекты создаются пакетами; пользователи и теги получают
+    префикс, по которому их можно удалить повторным запуском с flush.
+    Распределения неравномерные: у части авторов много рецептов и
+    подписчиков, как в настоящем каталоге.
+    """
+
+    def __init__(self, prefix='bench', seed=0, batch_size=1000):
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+
+    def flush(self):
+        """Удаляет пользователей и теги, созданные с тем же префиксом"""
+        with transaction.atomic():
+            deleted, _ = User.objects.filter(
+                username__startswith=f'{self.prefix}_').delete()
+            tags, _ = Tag.objects.filter(
+                slug__startswith=f'{self.prefix}-').delete()
+        return deleted + tags
+
+    def create_users(self, count):
+        password = make_password(None)
+        start = User.objects.filter(
+            username__startswith=f'{self.prefix}_').count()
+        names = [f'{self.prefix}_{number}'
+                 for number in range(start, start + count)]
+        User.objects.bulk_create(
+            (User(username=name, email=f'{name}@example.com',
+                  first_name='Пользователь', last_name=name,
+                  password=password)
+             for name in names)
+        )
+        return list(User.objects.filter(
+            username__in=names).values_list('pk', flat=True))
+
+    def create_tags(self, count):
+        existing = Tag.objects.filter(
+            slug__startswith=f'{self.prefix}-').count()
+        Tag.objects.bulk_create(
+            (Tag(name=f'Тег {number}', slug=f'{self.prefix}-{number}',
+                 color=f'#{number * 2654435761 % 0x1000000:06x}')
+             for number in range(existing, count)),
+            ignore_conflicts=True
+        )
+        return list(Tag.objects.filter(
+            slug__startswith=f'{self.prefix}-').values_list('pk', flat=True))
+
+    def create_ingredients(self, count):
+        """Справочник дополняется, если в нём меньше count ингредиентов"""
+        missing = count - Ingredient.objects.count()
+        if missing > 0:
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=f'{self.prefix} ингредиент {number}',
+                            measurement_unit='г')
+                 for number in range(missing)),
+                ignore_conflicts=True
+            )
+        return list(Ingredient.objects.values_list('pk', flat=True))
+
+    def weights(self, count):
+        """Вес по закону Парето: немногие объекты получают большую
+        часть рецептов и подписок"""
+        return [self.random.paretovariate(1.2) for _ in range(count)]
+
+    def recipe(self, author_id, now):
+        pub_date = now - timedelta(
+            seconds=self.random.randint(0, PUBLISHED_DAYS * 24 * 3600))
+        name = (f'{self.random.choice(ADJECTIVES).capitalize()} '
+                f'{self.random.choice(DISHES)}')
+        return Recipe(
+            author_id=author_id, name=name,
+            text=f'{name}: описание приготовления. ' * 5,
+            cooking_time=self.random.randint(5, 180),
+            pub_date=pub_date, updated_at=pub_date,
+        )
+
+    def create_recipes(self, count, author_ids, tag_ids, ingredient_ids,
+                       ingredients_per_recipe):
+        weights = self.weights(len(author_ids))
+        now = timezone.now()
+        recipe_ids = []
+        for numbers in batched(range(count), self.batch_size):
+            authors = self.random.choices(
+                author_ids, weights, k=len(numbers))
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create_with_dates(
+                    [self.recipe(author_id, now) for author_id in authors])
+                Recipe.tags.through.objects.bulk_create(
+                    Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                    for recipe in recipes
+                    for tag_id in self.random.sample(
+                        tag_ids, min(len(tag_ids), self.random.randint(1, 3)))
+                )
+                IngredientRecipeAmount.objects.bulk_create(
+                    (IngredientRecipeAmount(
+                        recipe_id=recipe.pk, ingredient_id=ingredient_id,
+                        amount=self.random.randint(1, 500))
+                     for recipe in recipes
+                     for ingredient_id in self.random.sample(
+                         ingredient_ids,
+                         min(len(ingredient_ids), ingredients_per_recipe)))
+                )
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+        return recipe_ids
+
+    def create_relations(self, model, field, user_ids, target_ids,
+                         per_user, exclude_self=False):
+        """Каждый пользователь получает до per_user связей; популярные
+        цели выбираются чаще"""
+        if not target_ids or not per_user:
+            return 0
+        weights = self.weights(len(target_ids))
+        created = 0
+        for users in batched(user_ids, self.batch_size):
+            objs = []
+            for user_id in users:
+                targets = set(self.random.choices(
+                    target_ids, weights, k=per_user))
+                if exclude_self:
+                    targets.discard(user_id)
+                objs.extend(model(user_id=user_id, **{field: target})
+                            for target in targets)
+            model.objects.bulk_create(objs, ignore_conflicts=True)
+            created += len(objs)
+        return created
+
+    def run(self, users, recipes, tags, ingredients, ingredients_per_recipe,
+            follows_per_user, favorites_per_user, carts_per_user):
+        """Создаёт данные и возвращает количество созданных объектов"""
+        user_ids = self.create_users(users)
+        tag_ids = self.create_tags(tags)
+        ingredient_ids = self.create_ingredients(ingredients)
+        recipe_ids = self.create_recipes(
+            recipes, user_ids, tag_ids, ingredient_ids,
+            ingredients_per_recipe)
+        created = {
+            'users': len(user_ids),
+            'tags': len(tag_ids),
+            'recipes': len(recipe_ids),
+            'follows': self.create_relations(
+                Follow, 'author_id', user_ids, user_ids, follows_per_user,
+                exclude_self=True),
+            'favorites': self.create_relations(
+                Favorite, 'recipe_id', user_ids, recipe_ids,
+                favorites_per_user),
+            'carts': self.create_relations(
+                ShoppingCart, 'recipe_id', user_ids, recipe_ids,
+                carts_per_user),
+        }
+        # Пакетная вставка обходит сигналы и сквозную запись, поэтому
+        # производные данные и версии обновляются в конце.
+        recount_recipe_counters(Recipe, self.batch_size)
+        rebuild_shopping_lists(fix=True)
+        for key in (INGREDIENTS_VERSION_KEY, TAGS_VERSION_KEY,
+                    RECIPES_VERSION_KEY, RECIPE_FEED_GENERATION_KEY):
+            bump_version(key)
+        cache.delete_many([user_relations_key(pk) for pk in user_ids])
+        return created
@@ -0,0 +1,151 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import (IngredientRecipeAmount, ShoppingCart,
+                            ShoppingListItem)
+
+User = get_user_model()
+
+
+def apply_shopping_list_deltas(deltas):
+    """Применяет изменения {(user_id, ingredient_id): delta} к спискам
+    покупок. Вызывается внутри транзакции изменения корзины или рецепта.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    user_ids = sorted({user_id for user_id, _ in deltas})
+    ingredient_ids = {ingredient_id for _, ingredient_id in deltas}
+    # Блокировка пользователей упорядочивает параллельные изменения
+    # одного списка покупок.
+    list(User.objects.select_for_update().filter(
+        pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+    existing = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=ingredient_ids)
+    }
+    to_create, to_update, to_delete = [], [], []
+    for (user_id, ingredient_id), delta in deltas.items():
+        item = existing.get((user_id, ingredient_id))
+        if item is None:
+            if delta > 0:
+                to_create.append(ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    amount=delta))
+            continue
+        item.amount += delta
+        if item.amount > 0:
+            to_update.append(item)
+        else:
+            to_delete.append(item.pk)
+    ShoppingListItem.objects.bulk_create(to_create)
+    ShoppingListItem.objects.bulk_update(to_update, ['amount'])
+    if to_delete:
+        ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+
+
+def change_cart(user, recipe_ids, sign):
+    """Добавляет (sign=1) или вычитает (sign=-1) ингредиенты рецептов
+    из списка покупок пользователя"""
+    totals = IngredientRecipeAmount.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values('ingredient_id').annotate(total=Sum('amount')).order_by()
+    apply_shopping_list_deltas({
+        (user.pk, row['ingredient_id']): sign * row['total']
+        for row in totals
+    })
+
+
+def change_recipe_ingredients(recipe, old, new):
+    """Переносит изменение ингредиентов рецепта {ingredient_id: amount}
+    в списки покупок всех, у кого рецепт лежит в корзине"""
+    changes = {
+        ingredient_id: new.get(ingredient_id, 0) - old.get(ingredient_id, 0)
+        for ingredient_id in old.keys() | new.keys()
+    }
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    user_ids = ShoppingCart.objects.filter(
+        recipe=recipe).values_list('user_id', flat=True)
+    apply_shopping_list_deltas({
+        (user_id, ingredient_id): delta
+        for user_id in user_ids
+        for ingredient_id, delta in changes.items()
+    })
+
+
+def shopping_list_user_ids():
+    """Пользователи, у которых есть корзина или список покупок"""
+    return sorted(
+        set(ShoppingCart.objects.values_list('user_id', flat=True)
+            .distinct().order_by())
+        | set(ShoppingListItem.objects.values_list('user_id', flat=True)
+              .distinct().order_by())
+    )
+
+
+def rebuild_user_shopping_lists(user_ids, fix):
+    """Сверяет и исправляет списки покупок пользователей user_ids.
+
+    При fix пользователи блокируются так же, как в
+    apply_shopping_list_deltas, до чтения корзин: изменения корзины
+    дождутся конца пересчёта или будут учтены в нём. Переписываются
+    только расходящиеся строки.
+    """
+    if fix:
+        list(User.objects.select_for_update().filter(
+            pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+    actual = defaultdict(int)
+    for row in IngredientRecipeAmount.objects.filter(
+            recipe__shoppingcart__user__in=user_ids
+    ).values('recipe__shoppingcart__user', 'ingredient_id').annotate(
+            total=Sum('amount')).order_by():
+        key = (row['recipe__shoppingcart__user'], row['ingredient_id'])
+        actual[key] = row['total']
+    stored = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingListItem.objects.filter(user_id__in=user_ids)
+    }
+    mismatches = []
+    to_create, to_update, to_delete = [], [], []
+    for key in stored.keys() | actual.keys():
+        item = stored.get(key)
+        amount = actual.get(key, 0)
+        if (item.amount if item else 0) == amount:
+            continue
+        mismatches.append(key + (item.amount if item else 0, amount))
+        if item is None:
+            to_create.append(ShoppingListItem(
+                user_id=key[0], ingredient_id=key[1], amount=amount))
+        elif amount:
+            item.amount = amount
+            to_update.append(item)
+        else:
+            to_delete.append(item.pk)
+    if fix:
+        ShoppingListItem.objects.bulk_create(to_create)
+        ShoppingListItem.objects.bulk_update(to_update, ['amount'])
+        if to_delete:
+            ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+    return mismatches
+
+
+def rebuild_shopping_lists(fix=True, batch_size=500):
+    """Пересчитывает списки покупок из корзин пачками по batch_size
+    пользователей, каждая пачка — в своей транзакции.
+
+    Возвращает расхождения в виде списка
+    (user_id, ingredient_id, сохранённое количество, верное количество).
+    """
+    user_ids = shopping_list_user_ids()
+    mismatches = []
+    for start in range(0, len(user_ids), batch_size):
+        with transaction.atomic():
+            mismatches += rebuild_user_shopping_lists(
+                user_ids[start:start + batch_size], fix)
+    return sorted(mismatches)
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.images import delete_recipe_image
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.shopping_list import change_recipe_ingredients
+from recipes.versions import (INGREDIENTS_VERSION_KEY,
+                              RECIPE_FEED_GENERATION_KEY, RECIPES_VERSION_KEY,
+                              TAGS_VERSION_KEY, bump_version)
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_version(INGREDIENTS_VERSION_KEY)
+    bump_version(RECIPE_FEED_GENERATION_KEY)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_version(TAGS_VERSION_KEY)
+    bump_version(RECIPE_FEED_GENERATION_KEY)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, **kwargs):
+    bump_version(RECIPE_FEED_GENERATION_KEY)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    ingredients = dict(instance.ingredient_amount.values_list(
+        'ingredient_id', 'amount'))
+    change_recipe_ingredients(instance, ingredients, {})
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed(sender, instance, **kwargs):
+    # Удаление не меняет updated_at оставшихся рецептов,
+    # поэтому списки рецептов сверяются ещё и с этой версией.
+    bump_version(RECIPES_VERSION_KEY)
+    bump_version(RECIPE_FEED_GENERATION_KEY)
+    image = instance.image.name
+    if image:
+        transaction.on_commit(lambda: delete_recipe_image(image))
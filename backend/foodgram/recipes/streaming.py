@@ -0,0 +1,92 @@
+import csv
+import json
+from itertools import islice
+
+CHUNK_SIZE = 64 * 1024
+SEPARATORS = ' \t\r\n,'
+
+
+def _open_array(file, chunk_size):
+    """Пропускает начало массива, возвращает остаток прочитанного"""
+    buffer = ''
+    while not buffer.strip():
+        buffer = file.read(chunk_size)
+        if not buffer:
+            raise ValueError('Ожидается JSON-массив')
+    buffer = buffer.lstrip()
+    if buffer[0] != '[':
+        raise ValueError('Ожидается JSON-массив')
+    return buffer[1:]
+
+
+def _decode_item(decoder, buffer, position, eof):
+    """Возвращает (элемент, конец) или (None, None), если нужно
+    дочитать файл.
+
+    Значение на границе чанка может быть прочитано не полностью,
+    например число, поэтому оно отдаётся, только когда за ним виден
+    разделитель.
+    """
+    if position == len(buffer):
+        return None, None
+    try:
+        item, end = decoder.raw_decode(buffer, position)
+    except json.JSONDecodeError as error:
+        if eof:
+            raise ValueError(f'Ошибка в JSON: {error}')
+        return None, None
+    if eof or end < len(buffer) and buffer[end] in SEPARATORS + ']':
+        return item, end
+    return None, None
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """Читает элементы JSON-массива по одному, не загружая файл целиком"""
+    decoder = json.JSONDecoder()
+    buffer = _open_array(file, chunk_size)
+    position = 0
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in SEPARATORS:
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        item, end = _decode_item(decoder, buffer, position, eof)
+        if end is not None:
+            yield item
+            position = end
+            continue
+        if eof:
+            raise ValueError('Неожиданный конец JSON-массива')
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def iter_json_lines(file):
+    """Читает построчный JSON (NDJSON)"""
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_csv_rows(file, fieldnames):
+    """Строки CSV в виде словарей; строка заголовка пропускается"""
+    for row in csv.reader(file):
+        if not row:
+            continue
+        item = dict(zip(fieldnames, row))
+        if list(item.values()) == list(fieldnames):
+            continue
+        yield item
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,29 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+INGREDIENTS_VERSION_KEY = 'ingredients_catalog_version'
+TAGS_VERSION_KEY = 'tags_catalog_version'
+RECIPES_VERSION_KEY = 'recipes_version'
+RECIPE_FEED_GENERATION_KEY = 'recipe_feed_generation'
+
+
+def user_relations_key(user_id):
+    """Избранное, корзина и подписки пользователя"""
+    return f'user_relations_version_{user_id}'
+
+
+def get_version(key):
+    """Время последнего изменения данных под ключом.
+
+    Если ключ пропал из кэша, версией становится текущее время: данные
+    считаются изменёнными, и устаревшие копии не будут использованы.
+    """
+    return cache.get_or_set(key, time.time(), None)
+
+
+def bump_version(key):
+    """Новая версия выставляется после фиксации транзакции, иначе
+    параллельный запрос может связать её со старыми данными"""
+    transaction.on_commit(lambda: cache.set(key, time.time(), None))
@@ -6,19 +6,18 @@ from djoser.conf import settings
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
-from recipes.models import Follow
+from api.instrumentation import TimedSerializerMixin
+from recipes.relations import get_request_relations
 
 User = get_user_model()
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(TimedSerializerMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, obj):
-        if not self.context['request'].user.is_anonymous:
-            return Follow.objects.filter(user=self.context['request'].user,
-                                         author=obj).exists()
-        return False
+        relations = get_request_relations(self.context['request'])
+        return obj.pk in relations.following
 
     class Meta:
         model = User